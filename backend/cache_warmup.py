@@ -0,0 +1,136 @@
+"""
+This module warms up the prediction cache after a deploy, so the first wave of traffic
+does not all miss. It runs as a background task of the lifespan and does not block readiness.
+
+Sources, in order of priority:
+- The most frequent completed queries in the chat_record table.
+- The evaluation questions in data/testing/eval_questions.json.
+- The questions of the labeled CSVs in data/labeled_data.
+
+The queries are deduplicated on their cache key, the ones already cached (for example in the
+shared Redis L2 by another replica) are skipped, and the rest are scored in batches on the
+inference executor before being written to the cache. The lookups of the warm-up are left out of
+the cache statistics and admission frequencies, and the semantic cache embeddings are computed
+per batch on the executor as well.
+"""
+
+# Import necessary modules and components
+import asyncio
+import logging
+import time
+
+from backend.crud.chat import get_frequent_queries
+from backend.db import sessionmanager
+from src.benchmark import load_eval_questions, load_labeled_data
+from src.settings import CacheWarmupSettings, LoggerSettings
+
+# Setup logger
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+
+async def _load_sources(top_queries: int) -> dict:
+    """
+    Collect the warm-up queries of every source, skipping the sources that are unavailable.
+
+    Args:
+    - top_queries (int): The number of most frequent chat record queries to include.
+
+    Returns:
+    - dict: The queries per source name.
+    """
+    sources = {}
+    try:
+        async with sessionmanager.session() as session:
+            sources["chat_record"] = await get_frequent_queries(session, top_queries)
+    except Exception as ex:
+        logger.warning(f"Cache warm-up skips the chat records: {ex}")
+
+    try:
+        questions, _ = await asyncio.to_thread(load_eval_questions)
+        sources["eval_questions"] = questions
+    except Exception as ex:
+        logger.warning(f"Cache warm-up skips the evaluation questions: {ex}")
+
+    try:
+        labeled_data = await asyncio.to_thread(load_labeled_data)
+        sources["labeled_data"] = labeled_data["Question"].dropna().tolist()
+    except Exception as ex:
+        logger.warning(f"Cache warm-up skips the labeled data: {ex}")
+
+    return sources
+
+
+async def warm_up_cache(
+    model,
+    executor,
+    cache,
+    semantic_cache=None,
+    top_queries: int = CacheWarmupSettings().cache_warmup_top_queries,
+    batch_size: int = CacheWarmupSettings().cache_warmup_batch_size,
+) -> dict:
+    """
+    Bulk-score the warm-up queries and pre-populate the prediction cache.
+
+    Args:
+    - model (ModelInference): The loaded model.
+    - executor (InferenceExecutor): The executor that runs the forward passes.
+    - cache (PredictionCache): The prediction cache to populate.
+    - semantic_cache (SemanticCache): The semantic cache to populate as well, if enabled.
+    - top_queries (int): The number of most frequent chat record queries to include.
+    - batch_size (int): The number of queries scored per forward pass on the executor.
+
+    Returns:
+    - dict: The number of queries per source, and of entries already cached and loaded.
+    """
+    start = time.perf_counter()
+    sources = await _load_sources(top_queries)
+
+    queries = {}
+    for source_queries in sources.values():
+        for query in source_queries:
+            queries.setdefault(cache.key(str(query)), str(query))
+
+    # not counted, so the warm-up neither skews the hit ratios nor fakes key frequencies
+    cached = await cache.get_many(list(queries), count=False)
+    pending = [
+        (key, query)
+        for (key, query), value in zip(queries.items(), cached)
+        if value is None
+    ]
+
+    loaded = 0
+    for start_idx in range(0, len(pending), batch_size):
+        batch = pending[start_idx : start_idx + batch_size]
+        # wait for a free slot instead of being rejected, live traffic keeps its share of the queue
+        results = await executor.run(
+            model.predict, [query for _, query in batch], batch_size, block=True
+        )
+        records = {
+            key: {
+                "user_query": query,
+                "session_id": None,
+                "chat_id": None,
+                "status": "completed",
+                "prediction_label": result["prediction_label"],
+                "prediction_probability": result["prediction_probability"],
+            }
+            for (key, query), result in zip(batch, results)
+        }
+        await cache.set_many(records)
+        if semantic_cache is not None:
+            embeddings = await executor.run(
+                semantic_cache.embed_many, [query for _, query in batch], block=True
+            )
+            for embedding, record in zip(embeddings, records.values()):
+                semantic_cache.add(embedding, record)
+        loaded += len(batch)
+
+    summary = {
+        "sources": {name: len(source) for name, source in sources.items()},
+        "unique_queries": len(queries),
+        "already_cached": len(queries) - len(pending),
+        "loaded": loaded,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    logger.info(f"Cache warm-up finished: {summary}")
+    return summary
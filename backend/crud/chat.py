@@ -2,15 +2,21 @@
 This module provides CRUD operations for the ChatRecord model using SQLAlchemy with asynchronous support.
 Functions included:
 - create_chat: Create a new chat record.
+- create_chats_bulk: Create many chat records in one bulk INSERT.
+- upsert_chat: Write a completed chat record in one INSERT ... ON CONFLICT ... RETURNING statement.
 - update_chat_by_chatid: Update an existing chat record by its chat_id.
 - get_chat_by_chatid: Retrieve a chat record by its chat_id.
 - delete_chat_by_chatid: Delete a chat record by its chat_id.
+- get_frequent_queries: Retrieve the most frequently asked queries.
+- stream_chats_by_chatids: Stream the chat records of many chat_ids resolved in one query.
+- stream_chats_by_session: Stream a page of the chat records of a session with keyset pagination.
 """
 
 # Import necessary modules and components
 import uuid
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.db_models.models import ChatRecord
 import logging
@@ -38,6 +44,61 @@ async def create_chat(db_session: AsyncSession, chat_dict: dict):
     return chat_record
 
 
+async def create_chats_bulk(db_session: AsyncSession, chat_dicts: list[dict]):
+    """
+    Create many chat records in one bulk INSERT and a single commit, meant for the write-behind queue.
+    The records are not refreshed, so nothing is read back.
+
+    Args:
+    - db_session (AsyncSession): The database session.
+    - chat_dicts (list[dict]): The chat record details, all with the same keys.
+
+    Returns:
+    - int: The number of records inserted.
+    """
+    if not chat_dicts:
+        return 0
+    await db_session.execute(insert(ChatRecord), chat_dicts)
+    await db_session.commit()
+    return len(chat_dicts)
+
+
+async def upsert_chat(db_session: AsyncSession, chat_dict: dict):
+    """
+    Write a completed chat record in a single round trip, meant to be used with the prediction route.
+    The record is inserted, or updated in place if its chat_id already exists, and read back
+    through RETURNING, so no refresh is needed after the commit. Works on Postgres and SQLite.
+
+    Args:
+    - db_session (AsyncSession): The database session.
+    - chat_dict (dict): A dictionary containing the chat record details, including its chat_id.
+
+    Returns:
+    - dict: The written chat record.
+
+    Raises:
+    - ValueError: If the database dialect has no ON CONFLICT support here.
+    """
+    dialect = db_session.bind.dialect.name
+    if dialect == "postgresql":
+        statement = postgresql.insert(ChatRecord)
+    elif dialect == "sqlite":
+        statement = sqlite.insert(ChatRecord)
+    else:
+        raise ValueError(f"Upsert is not supported for the {dialect} dialect")
+
+    statement = statement.values(**chat_dict)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ChatRecord.chat_id],
+        set_={key: statement.excluded[key] for key in chat_dict if key != "chat_id"},
+    ).returning(*ChatRecord.__table__.columns)
+
+    result = await db_session.execute(statement)
+    record = dict(result.mappings().one())
+    await db_session.commit()
+    return record
+
+
 async def update_chat_by_chatid(db_session: AsyncSession, chat_dict: dict):
     """
     Update an existing chat record in the database by its chat_id and meant to be used with the prediction route.
@@ -136,3 +197,75 @@ async def delete_chat_by_chatid(db_session: AsyncSession, chat_id: uuid.UUID):
     await db_session.commit()
     await db_session.refresh(record)
     return
+
+
+async def get_frequent_queries(db_session: AsyncSession, limit: int = 1000):
+    """
+    Retrieve the most frequently asked queries among the completed chat records.
+
+    Args:
+    - db_session (AsyncSession): The database session.
+    - limit (int): The maximum number of queries to return.
+
+    Returns:
+    - list[str]: The queries, most frequent first.
+    """
+    result = await db_session.execute(
+        select(ChatRecord.user_query)
+        .filter(ChatRecord.status == "completed")
+        .group_by(ChatRecord.user_query)
+        .order_by(func.count(ChatRecord.id).desc())
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def stream_chats_by_chatids(db_session: AsyncSession, chat_ids: list[uuid.UUID]):
+    """
+    Stream the chat records of many chat_ids, resolved in a single SELECT ... WHERE chat_id IN query.
+    Chat_ids without a record are skipped.
+
+    Args:
+    - db_session (AsyncSession): The database session.
+    - chat_ids (list[uuid.UUID]): The unique identifiers of the chat records.
+
+    Yields:
+    - ChatRecord: The chat records found, in insertion order.
+    """
+    result = await db_session.stream_scalars(
+        select(ChatRecord)
+        .filter(ChatRecord.chat_id.in_(chat_ids))
+        .order_by(ChatRecord.id)
+    )
+    async for record in result:
+        yield record
+
+
+async def stream_chats_by_session(
+    db_session: AsyncSession,
+    session_id: uuid.UUID,
+    after_id: int = 0,
+    limit: int = 100,
+):
+    """
+    Stream one page of the chat records of a session with keyset (seek) pagination.
+    The page starts right after the record with row ID `after_id`, so the database seeks
+    through the session_id index instead of scanning the skipped rows as OFFSET would.
+
+    Args:
+    - db_session (AsyncSession): The database session.
+    - session_id (uuid.UUID): The unique identifier of the session.
+    - after_id (int): The row ID of the last record of the previous page, 0 for the first page.
+    - limit (int): The maximum number of records of the page.
+
+    Yields:
+    - ChatRecord: The chat records of the page, oldest first.
+    """
+    result = await db_session.stream_scalars(
+        select(ChatRecord)
+        .filter(ChatRecord.session_id == session_id, ChatRecord.id > after_id)
+        .order_by(ChatRecord.id)
+        .limit(limit)
+    )
+    async for record in result:
+        yield record
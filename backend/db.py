@@ -1,27 +1,198 @@
 import contextlib
+import inspect
+import time
 from typing import AsyncIterator
 
+import sqlalchemy
+from greenlet import getcurrent
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from src.settings import env_settings
+from src.utils.metrics import Histogram
 
 from sqlalchemy.orm import declarative_base
 from typing import Any
 
 Base = declarative_base()
 
+# the max_overflow of a queue pool created without one
+DEFAULT_MAX_OVERFLOW = (
+    inspect.signature(AsyncAdaptedQueuePool.__init__).parameters["max_overflow"].default
+)
+# the SQLAlchemy releases whose private QueuePool._do_get hook TimedQueuePool was checked against
+TIMED_POOL_SQLALCHEMY_VERSIONS = ("2.0",)
+
+
+class DBMetrics:
+    """
+    Timing histograms of the statements, sessions and new connections, and the checkout wait
+    and usage of the pool.
+    """
+
+    def __init__(self):
+        self.statements = {}
+        self.sessions = Histogram()
+        self.connects = Histogram()
+        self.checkout_wait = Histogram()
+        self.max_checked_out = 0
+        self.max_overflow = DEFAULT_MAX_OVERFLOW
+        # connection time spent inside the checkouts in progress, per greenlet
+        self._checkout_connect_ms = {}
+
+    def observe_statement(self, statement: str, elapsed_ms: float):
+        """
+        Record the duration of a statement under its type (SELECT, INSERT, ...).
+        """
+        kind = statement.split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        histogram = self.statements.get(kind)
+        if histogram is None:
+            histogram = self.statements.setdefault(kind, Histogram())
+        histogram.observe(elapsed_ms)
+
+    def observe_connect(self, elapsed_ms: float):
+        """
+        Record the duration of a new connection, and set it aside from the checkout wait
+        of the checkout that opened it.
+        """
+        self.connects.observe(elapsed_ms)
+        current = getcurrent()
+        if current in self._checkout_connect_ms:
+            self._checkout_connect_ms[current] += elapsed_ms
+
+    def stats(self, pool) -> dict:
+        """
+        Returns the timing histograms and the current saturation of the given pool.
+        """
+        pool_stats = None
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            # a negative max_overflow lets the pool grow without limit
+            capacity = pool.size() + self.max_overflow if self.max_overflow >= 0 else 0
+            pool_stats = {
+                "size": pool.size(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": self.max_overflow,
+                "checked_out": pool.checkedout(),
+                "max_checked_out": self.max_checked_out,
+                "saturation": (
+                    round(pool.checkedout() / capacity, 4) if capacity else None
+                ),
+                "checkout_wait": (
+                    self.checkout_wait.stats()
+                    if isinstance(pool, TimedQueuePool)
+                    else None
+                ),
+            }
+        return {
+            "statements": {
+                kind: histogram.stats() for kind, histogram in self.statements.items()
+            },
+            "sessions": self.sessions.stats(),
+            "connects": self.connects.stats(),
+            "pool": pool_stats,
+        }
+
+
+engine_metrics = DBMetrics()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Connection pool that records how long each checkout waits for a connection.
+    The time spent opening a new connection is recorded separately, see `instrument_engine`.
+
+    No public event fires before a checkout starts waiting, so the wait is timed around the
+    private `QueuePool._do_get` hook. The pool is only used on the SQLAlchemy releases it was
+    checked against, see `timed_pool_supported`; other releases keep the default pool and
+    report no checkout wait.
+    """
+
+    def _do_get(self):
+        current = getcurrent()
+        engine_metrics._checkout_connect_ms[current] = 0.0
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            connect_ms = engine_metrics._checkout_connect_ms.pop(current, 0.0)
+            engine_metrics.checkout_wait.observe(
+                (time.perf_counter() - start) * 1000 - connect_ms
+            )
+
+
+def timed_pool_supported() -> bool:
+    """Whether TimedQueuePool can hook into the queue pool of the installed SQLAlchemy."""
+    version = ".".join(sqlalchemy.__version__.split(".")[:2])
+    return version in TIMED_POOL_SQLALCHEMY_VERSIONS and hasattr(
+        AsyncAdaptedQueuePool, "_do_get"
+    )
+
+
+def instrument_engine(engine):
+    """
+    Attach the event hooks that time every statement and every new connection of the engine,
+    and track the peak number of checked out connections.
+    """
+
+    if isinstance(engine.sync_engine.pool, AsyncAdaptedQueuePool):
+
+        @event.listens_for(engine.sync_engine, "checkout")
+        def _track_checkout(dbapi_connection, connection_record, connection_proxy):
+            engine_metrics.max_checked_out = max(
+                engine_metrics.max_checked_out, engine.sync_engine.pool.checkedout()
+            )
+
+    @event.listens_for(engine.sync_engine, "do_connect")
+    def _timed_connect(dialect, conn_rec, cargs, cparams):
+        start = time.perf_counter()
+        connection = dialect.connect(*cargs, **cparams)
+        engine_metrics.observe_connect((time.perf_counter() - start) * 1000)
+        return connection
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        engine_metrics.observe_statement(
+            statement, (time.perf_counter() - start) * 1000
+        )
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _drop_timer(exception_context):
+        starts = exception_context.connection.info.get("query_start")
+        if starts:
+            starts.pop()
+
 
 class DatabaseSessionManager:
     """
     A manager for managing database sessions asynchronously using SQLAlchemy.
+    The engine is instrumented with statement, session and pool checkout timings.
     """
 
     def __init__(self, url: str, engine_kwargs: dict[str, Any] = {}):
+        # the timed pool only replaces a queue pool, other dialects keep their default pool
+        # (a static pool for in-memory SQLite, for instance)
+        url = make_url(url)
+        if (
+            issubclass(url.get_dialect().get_pool_class(url), AsyncAdaptedQueuePool)
+            and timed_pool_supported()
+        ):
+            engine_kwargs = {"poolclass": TimedQueuePool, **engine_kwargs}
+        engine_metrics.max_overflow = engine_kwargs.get(
+            "max_overflow", DEFAULT_MAX_OVERFLOW
+        )
         self._engine = create_async_engine(url, **engine_kwargs)
+        instrument_engine(self._engine)
         self._sessionmaker = async_sessionmaker(autocommit=False, bind=self._engine)
 
     async def close(self):
@@ -59,6 +230,7 @@ class DatabaseSessionManager:
             raise Exception("DatabaseSessionManager is not initialized")
 
         session = self._sessionmaker()
+        start = time.perf_counter()
         try:
             yield session
         except Exception:
@@ -66,9 +238,46 @@ class DatabaseSessionManager:
             raise
         finally:
             await session.close()
+            engine_metrics.sessions.observe((time.perf_counter() - start) * 1000)
 
 
-sessionmanager = DatabaseSessionManager(env_settings.DB_URI, {"echo": True})
+sessionmanager = DatabaseSessionManager(
+    env_settings.DB_URI, {"echo": env_settings.DB_ECHO}
+)
+
+
+# set once the tables are created, and inherited by the workers forked afterwards
+_tables_ready = False
+
+
+async def init_db():
+    """
+    Create the database tables, dropping them first when DB_RESET_ON_STARTUP is set.
+    Runs once per process tree: in a worker forked from a process that already created
+    the tables, such as the gunicorn master, it does nothing, so that workers never drop
+    the tables another worker writes to.
+    """
+    global _tables_ready
+    if _tables_ready:
+        return
+
+    # the ORM models register their tables on Base.metadata when imported
+    import backend.db_models.models  # noqa: F401
+
+    async with sessionmanager._engine.begin() as conn:
+        if env_settings.DB_RESET_ON_STARTUP:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    _tables_ready = True
+
+
+async def init_db_before_fork():
+    """
+    Create the database tables from the master process, then drop the pooled connections
+    so that no forked worker inherits a connection bound to this event loop.
+    """
+    await init_db()
+    await sessionmanager._engine.dispose()
 
 
 async def get_db_session() -> AsyncSession:
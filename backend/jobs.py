@@ -0,0 +1,608 @@
+"""
+This module runs asynchronous classification jobs over uploaded CSV datasets shaped like the
+files of data/labeled_data (Domain, Question, FinalLabel).
+An uploaded file is written to its own job directory and queued. Background job workers read
+it in chunks, score each chunk in one batched call of the model, and append the predictions to
+the result file, so a long job never holds a request worker.
+
+The jobs share the inference executor of the live predictions at a lower priority: a chunk is
+only submitted while the executor is idle, so the forward passes of a job never run next to
+live ones. A live prediction arriving meanwhile waits for at most the chunk being scored.
+
+The status of each job is kept in a status.json file next to its input and result files and
+rewritten after every chunk, so the progress can be polled from any API worker process.
+The status also records the process owning the job and a lease, renewed by every write of the
+status and periodically for the queued and running jobs. The unfinished jobs whose lease
+expired, or whose owner was a process of this host that is gone, are claimed by another
+process and scored again from the start; their former owner stops scoring them.
+The directories of finished jobs are deleted once older than the retention period.
+
+Components:
+- ClassificationJob: The state and progress of one job.
+- JobManager: Stores the uploaded files and runs the queued jobs on background workers.
+"""
+
+# Import necessary modules and components
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from src.settings import DataSettings, JobSettings, LoggerSettings
+
+# Setup logger
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+QUESTION_COLUMN = "Question"
+LABEL_COLUMN = "FinalLabel"
+# how long a job backs off before a chunk while live predictions are running or queued
+YIELD_INTERVAL_S = 0.01
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when the maximum number of pending jobs is reached."""
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an uploaded file exceeds the maximum upload size."""
+
+
+class JobReclaimed(RuntimeError):
+    """Raised when a job was claimed by another process after its lease expired."""
+
+
+class ClassificationJob:
+    """
+    State and progress of a CSV classification job.
+
+    Attributes:
+    - job_id (str): The unique job identifier.
+    - job_dir (str): The directory holding the input, result and status files of the job.
+    - filename (str): The name of the uploaded file.
+    - status (str): The job status, "queued", "running", "completed" or "failed".
+    - total_rows (int): The number of rows of the file, once counted.
+    - processed_rows (int): The number of rows scored so far.
+    - labeled_rows (int): The number of scored rows with a known FinalLabel.
+    - correct_rows (int): The number of labeled rows whose prediction matches FinalLabel.
+    - owner (str): The host, process id and manager instance scoring the job.
+    - heartbeat_at (datetime): The last write of the status file, which renews the lease of the owner.
+    """
+
+    def __init__(
+        self, job_id: str, job_dir: str, filename: str = None, owner: str = None
+    ):
+        self.job_id = job_id
+        self.job_dir = job_dir
+        self.filename = filename
+        self.owner = owner
+        self.status = "queued"
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+        self.total_rows = None
+        self.processed_rows = 0
+        self.labeled_rows = 0
+        self.correct_rows = 0
+        self.scoring_seconds = 0.0
+        self.error = None
+        self.heartbeat_at = None
+
+    @classmethod
+    def from_status(cls, job_dir: str, status: dict) -> "ClassificationJob":
+        """
+        Rebuild a job from its status file, with its progress reset.
+        """
+        job = cls(
+            status["job_id"], job_dir, status.get("filename"), status.get("owner")
+        )
+        job.created_at = datetime.fromisoformat(status["created_at"])
+        return job
+
+    @property
+    def input_path(self) -> str:
+        return os.path.join(self.job_dir, "input.csv")
+
+    @property
+    def result_path(self) -> str:
+        return os.path.join(self.job_dir, "result.csv")
+
+    @property
+    def status_path(self) -> str:
+        return os.path.join(self.job_dir, "status.json")
+
+    def to_dict(self) -> dict:
+        """
+        Returns the status, progress, throughput and accuracy of the job.
+        """
+        elapsed = self.scoring_seconds
+        if self.status == "running":
+            elapsed = time.time() - self.started_at.timestamp()
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "owner": self.owner,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "total_rows": self.total_rows,
+            "processed_rows": self.processed_rows,
+            "progress": (
+                round(self.processed_rows / self.total_rows, 4)
+                if self.total_rows
+                else None
+            ),
+            "rows_per_second": (
+                round(self.processed_rows / elapsed, 2) if elapsed > 0 else None
+            ),
+            "labeled_rows": self.labeled_rows,
+            "correct_rows": self.correct_rows,
+            "accuracy": (
+                round(self.correct_rows / self.labeled_rows, 4)
+                if self.labeled_rows
+                else None
+            ),
+            "result_path": self.result_path if self.status == "completed" else None,
+            "error": self.error,
+            "heartbeat_at": (
+                self.heartbeat_at.isoformat() if self.heartbeat_at else None
+            ),
+        }
+
+    def save(self):
+        """
+        Write the status file of the job, replacing the previous one atomically,
+        and renew the lease of its owner.
+        """
+        self.heartbeat_at = datetime.now(timezone.utc)
+        tmp_path = f"{self.status_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.to_dict(), file)
+        os.replace(tmp_path, self.status_path)
+
+
+class JobManager:
+    """
+    Manager of the CSV classification jobs.
+
+    Attributes:
+    - model (ModelInference): The loaded model.
+    - executor (InferenceExecutor): The executor of the live predictions, which the jobs
+      share when it is idle.
+    - jobs_dir (str): The directory holding one subdirectory per job.
+    - batch_size (int): The number of rows scored per call of the model.
+    - workers (int): The number of jobs run concurrently by this process.
+    - max_pending (int): The maximum number of queued jobs, submitting fails when it is reached.
+    - max_upload_bytes (int): The maximum size of an uploaded file.
+    - lease_seconds (int): How long an unfinished job stays owned without a status write,
+      before another process may claim it.
+    - retention_hours (int): How long the files of a finished job are kept.
+    """
+
+    def __init__(
+        self,
+        model,
+        executor,
+        jobs_dir: str = JobSettings().jobs_dir,
+        batch_size: int = JobSettings().job_batch_size,
+        workers: int = JobSettings().job_workers,
+        max_pending: int = JobSettings().job_max_pending,
+        max_upload_bytes: int = JobSettings().job_max_upload_bytes,
+        lease_seconds: int = JobSettings().job_lease_seconds,
+        retention_hours: int = JobSettings().job_retention_hours,
+    ):
+        self.model = model
+        self.executor = executor
+        self.jobs_dir = jobs_dir
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_upload_bytes = max_upload_bytes
+        self.lease_seconds = lease_seconds
+        self.retention_hours = retention_hours
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        """
+        Start the background job workers and the maintenance task, after claiming the
+        unfinished jobs of processes that are gone and deleting the expired job files.
+        """
+        logger.info(
+            f"Starting {self.workers} classification job workers on {self.jobs_dir} "
+            f"with batches of {self.batch_size} rows"
+        )
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        await self._recover()
+        await self._sweep()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self):
+        """
+        Stop the job workers and the maintenance task. Jobs still queued or running keep
+        their status, and are scored again by the next process that claims them.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        unfinished = [
+            job for job in self._jobs.values() if job.status in ("queued", "running")
+        ]
+        if unfinished:
+            logger.info(
+                f"Leaving {len(unfinished)} unfinished classification jobs to the next start"
+            )
+
+    async def submit(self, filename: str, chunks) -> ClassificationJob:
+        """
+        Write an uploaded CSV file to a new job directory and queue the job.
+
+        Args:
+        - filename (str): The name of the uploaded file.
+        - chunks (AsyncIterator[bytes]): The content of the file.
+
+        Returns:
+        - ClassificationJob: The queued job.
+
+        Raises:
+        - JobQueueFull: If the maximum number of pending jobs is reached.
+        - UploadTooLarge: If the file exceeds the maximum upload size.
+        - ValueError: If the file is not a CSV file with a Question column.
+        """
+        if self._queue is None:
+            raise RuntimeError("JobManager is not started")
+        if self._queue.full():
+            raise JobQueueFull(f"{self.max_pending} classification jobs already queued")
+
+        job_id = str(uuid.uuid4())
+        job = ClassificationJob(
+            job_id, os.path.join(self.jobs_dir, job_id), filename, self.owner
+        )
+        os.makedirs(job.job_dir)
+        try:
+            size = 0
+            with open(job.input_path, "wb") as file:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise UploadTooLarge(
+                            f"file larger than {self.max_upload_bytes} bytes"
+                        )
+                    await asyncio.to_thread(file.write, chunk)
+            await asyncio.to_thread(self._check_columns, job.input_path)
+            await asyncio.to_thread(job.save)
+            # other uploads may have filled the queue while this one was written
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            await asyncio.to_thread(shutil.rmtree, job.job_dir, True)
+            raise JobQueueFull(f"{self.max_pending} classification jobs already queued")
+        except Exception:
+            await asyncio.to_thread(shutil.rmtree, job.job_dir, True)
+            raise
+
+        self._jobs[job_id] = job
+        logger.info(f"Queued classification job {job_id} for {filename} ({size} bytes)")
+        return job
+
+    async def get(self, job_id: str):
+        """
+        Returns the status of a job, read from its status file when the job was submitted
+        to another worker process, or None if the job is unknown.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+
+        status_path = os.path.join(self.jobs_dir, job_id, "status.json")
+        try:
+            return await asyncio.to_thread(_read_json, status_path)
+        except FileNotFoundError:
+            return None
+
+    def stats(self) -> dict:
+        """
+        Returns the number of jobs per status known to this process.
+        """
+        counts = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"pending": self._queue.qsize() if self._queue else 0, **counts}
+
+    def _is_orphan(self, status: dict) -> bool:
+        """
+        Whether the owner of an unfinished job is gone: its lease expired, or it was a
+        process of this host that no longer runs. Processes of other hosts are only
+        known from their lease.
+        """
+        owner = status.get("owner")
+        if owner == self.owner:
+            return False
+        try:
+            heartbeat_at = datetime.fromisoformat(status["heartbeat_at"])
+            host, pid, _ = owner.split(":")
+            pid = int(pid)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return True
+
+        lease_age = (datetime.now(timezone.utc) - heartbeat_at).total_seconds()
+        if lease_age > self.lease_seconds:
+            return True
+        if host != socket.gethostname():
+            return False
+        if pid == os.getpid():
+            # the pid of a previous process reused by this one
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    @staticmethod
+    def _claim_path(job_dir: str, owner: str) -> str:
+        """The file marking that the job of `owner` was claimed by another process."""
+        return os.path.join(job_dir, f"claimed.{owner}")
+
+    def _claim_orphans(self) -> list:
+        """
+        Returns the unfinished jobs whose owner is gone, each claimed by this manager only.
+        """
+        jobs = []
+        for job_id in sorted(os.listdir(self.jobs_dir)):
+            job_dir = os.path.join(self.jobs_dir, job_id)
+            try:
+                status = _read_json(os.path.join(job_dir, "status.json"))
+            except (OSError, ValueError):
+                continue
+            if status.get("status") not in ("queued", "running"):
+                continue
+            if not self._is_orphan(status):
+                continue
+            # several processes race for the same orphan, one claim wins
+            claim_path = self._claim_path(job_dir, status.get("owner"))
+            try:
+                os.close(os.open(claim_path, os.O_CREAT | os.O_EXCL))
+            except FileExistsError:
+                continue
+            job = ClassificationJob.from_status(job_dir, status)
+            job.owner = self.owner
+            jobs.append(job)
+        return jobs
+
+    async def _recover(self):
+        """
+        Queue again the unfinished jobs of processes that are gone, failing the ones that
+        do not fit in the queue.
+        """
+        for job in await asyncio.to_thread(self._claim_orphans):
+            self._jobs[job.job_id] = job
+            if self._queue.full():
+                self._finish(
+                    job, error="its process was lost and the job queue was full"
+                )
+            else:
+                self._queue.put_nowait(job)
+                logger.info(
+                    f"Re-queued classification job {job.job_id} of a lost process"
+                )
+            await asyncio.to_thread(job.save)
+
+    def _reclaimed(self, job: ClassificationJob) -> bool:
+        """Whether another process claimed the job after the lease of this manager expired."""
+        return os.path.exists(self._claim_path(job.job_dir, self.owner))
+
+    def _ensure_owned(self, job: ClassificationJob):
+        """Raises a JobReclaimed error if another process claimed the job."""
+        if self._reclaimed(job):
+            raise JobReclaimed(f"job {job.job_id} was claimed by another process")
+
+    async def _renew_leases(self):
+        """
+        Write the status of the queued and running jobs, which renews their leases.
+        """
+        for job in list(self._jobs.values()):
+            if job.status not in ("queued", "running"):
+                continue
+            if await asyncio.to_thread(self._reclaimed, job):
+                logger.warning(
+                    f"Classification job {job.job_id} was claimed by another process"
+                )
+                # its worker stops before the next chunk
+                self._jobs.pop(job.job_id, None)
+                continue
+            await asyncio.to_thread(job.save)
+
+    def _expired_job_dirs(self) -> list:
+        """
+        Returns the directories of the jobs finished before the retention period, and of
+        the uploads that never got a status file.
+        """
+        cutoff = time.time() - self.retention_hours * 3600
+        job_dirs = []
+        for job_id in os.listdir(self.jobs_dir):
+            job_dir = os.path.join(self.jobs_dir, job_id)
+            try:
+                status = _read_json(os.path.join(job_dir, "status.json"))
+            except FileNotFoundError:
+                # an upload still being written, or interrupted before its status was saved
+                try:
+                    if os.path.getmtime(job_dir) < cutoff:
+                        job_dirs.append(job_dir)
+                except OSError:
+                    pass
+                continue
+            except (OSError, ValueError):
+                continue
+            if status.get("status") not in ("completed", "failed"):
+                continue
+            try:
+                finished_at = datetime.fromisoformat(status["finished_at"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if finished_at.timestamp() < cutoff:
+                job_dirs.append(job_dir)
+        return job_dirs
+
+    async def _sweep(self):
+        """
+        Delete the files of the jobs finished before the retention period.
+        """
+        job_dirs = await asyncio.to_thread(self._expired_job_dirs)
+        for job_dir in job_dirs:
+            await asyncio.to_thread(shutil.rmtree, job_dir, True)
+            self._jobs.pop(os.path.basename(job_dir), None)
+        if job_dirs:
+            logger.info(
+                f"Deleted {len(job_dirs)} classification jobs older than "
+                f"{self.retention_hours} hours"
+            )
+
+    async def _maintain(self):
+        """
+        Renew the leases of the jobs of this manager, claim the jobs of lost processes and
+        delete the expired job files, a few times per lease period.
+        """
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self._renew_leases()
+                await self._recover()
+                await self._sweep()
+            except Exception:
+                logger.exception("Classification job maintenance failed")
+
+    @staticmethod
+    def _check_columns(path: str):
+        """
+        Raises a ValueError if the file is not a CSV file with a Question column.
+        """
+        try:
+            columns = pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError):
+            raise ValueError("the uploaded file is not a UTF-8 CSV file")
+        if QUESTION_COLUMN not in columns:
+            raise ValueError(f'the uploaded CSV file has no "{QUESTION_COLUMN}" column')
+
+    @staticmethod
+    def _count_rows(path: str) -> int:
+        return sum(
+            len(chunk)
+            for chunk in pd.read_csv(
+                path, usecols=[QUESTION_COLUMN], chunksize=10000, encoding="utf-8-sig"
+            )
+        )
+
+    def _finish(self, job: ClassificationJob, error: str = None):
+        job.status = "failed" if error else "completed"
+        job.error = error
+        job.finished_at = datetime.now(timezone.utc)
+        if job.started_at is not None:
+            job.scoring_seconds = (job.finished_at - job.started_at).total_seconds()
+
+    async def _process(self, job: ClassificationJob):
+        """
+        Score the rows of a job chunk by chunk and append them to its result file.
+        """
+        self._ensure_owned(job)
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        job.total_rows = await asyncio.to_thread(self._count_rows, job.input_path)
+        await asyncio.to_thread(job.save)
+
+        class_names = DataSettings().class_names
+        partial_path = f"{job.result_path}.part"
+        if os.path.exists(partial_path):
+            # left over by an interrupted run of the job
+            os.remove(partial_path)
+        reader = pd.read_csv(
+            job.input_path, chunksize=self.batch_size, encoding="utf-8-sig"
+        )
+        with reader:
+            while True:
+                chunk = await asyncio.to_thread(next, reader, None)
+                if chunk is None:
+                    break
+
+                self._ensure_owned(job)
+                questions = chunk[QUESTION_COLUMN].fillna("").astype(str).tolist()
+                # live predictions go first: the chunk waits until none is running or queued,
+                # and is submitted without yielding to the loop in between
+                while self.executor.in_flight > 0:
+                    await asyncio.sleep(YIELD_INTERVAL_S)
+                results = await self.executor.run(
+                    self.model.predict, questions, self.batch_size, block=True
+                )
+                chunk["prediction_label"] = [r["prediction_label"] for r in results]
+                chunk["prediction_probability"] = [
+                    r["prediction_probability"] for r in results
+                ]
+
+                if LABEL_COLUMN in chunk:
+                    labels = chunk[LABEL_COLUMN].astype(str).str.strip().str.upper()
+                    labeled = labels.isin(class_names)
+                    job.labeled_rows += int(labeled.sum())
+                    job.correct_rows += int(
+                        (labels[labeled] == chunk["prediction_label"][labeled]).sum()
+                    )
+
+                await asyncio.to_thread(
+                    chunk.to_csv,
+                    partial_path,
+                    mode="a",
+                    header=job.processed_rows == 0,
+                    index=False,
+                )
+                job.processed_rows += len(chunk)
+                await asyncio.to_thread(job.save)
+
+        if job.processed_rows == 0:
+            # a header-only file still gets a result file with the output columns
+            columns = pd.read_csv(job.input_path, nrows=0, encoding="utf-8-sig").columns
+            pd.DataFrame(
+                columns=[*columns, "prediction_label", "prediction_probability"]
+            ).to_csv(partial_path, index=False)
+        os.replace(partial_path, job.result_path)
+
+    async def _run(self):
+        while True:
+            job = await self._queue.get()
+            logger.info(f"Starting classification job {job.job_id}")
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except JobReclaimed as ex:
+                # the status file belongs to the new owner now
+                logger.warning(f"Stopped classification job {job.job_id}: {ex}")
+                self._jobs.pop(job.job_id, None)
+                continue
+            except Exception as ex:
+                logger.exception(f"Classification job {job.job_id} failed")
+                self._finish(job, error=str(ex))
+            else:
+                self._finish(job)
+                logger.info(
+                    f"Classification job {job.job_id} completed: "
+                    f"{job.processed_rows} rows in {job.scoring_seconds:.1f} s"
+                )
+            await asyncio.to_thread(job.save)
+
+
+def _read_json(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,104 @@
+"""
+This module defines read-only API endpoints for looking up many chat records at once.
+They are kept apart from the chat router, whose single-record and delete endpoints stay disabled.
+
+Endpoints:
+- POST /chat/bulk: Stream the chat records of many chat IDs, resolved in one query.
+- GET /chat/session/{session_id}: Stream a page of the history of a session, with keyset pagination.
+
+Both endpoints stream newline-delimited JSON, one chat record per line.
+"""
+
+# Import necessary modules and components
+from backend.crud.chat import stream_chats_by_chatids, stream_chats_by_session
+from backend.db import sessionmanager
+from fastapi import APIRouter, status, Request, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from backend.schemas.input import ChatRecordShow, ChatIdsLookup
+import uuid
+import logging
+from src.settings import LoggerSettings
+from backend.dependencies.auth import security, verification
+from typing import Annotated
+
+# Setup logger
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+# Initialize router
+router = APIRouter(tags=["chat_records"])
+
+
+async def _stream_ndjson(stream_records, *args):
+    """
+    Serialize chat records to newline-delimited JSON as they are read from the database.
+    The session is opened here rather than through the request dependency, so it stays
+    open until the last record has been sent.
+    """
+    async with sessionmanager.session() as session:
+        async for record in stream_records(session, *args):
+            yield ChatRecordShow.model_validate(record).model_dump_json() + "\n"
+
+
+@router.post(
+    "/chat/bulk",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_chats_by_chatids_api(
+    request: Request,
+    lookup: ChatIdsLookup,
+    Verification: Annotated[bool, Depends(verification)],
+):
+    """
+    Stream the chat records of many chat IDs, resolved in a single query.
+
+    Args:
+    - request (Request): The incoming request object.
+    - lookup (ChatIdsLookup): The chat IDs to look up.
+
+    Returns:
+    - StreamingResponse: Newline-delimited ChatRecordShow records. Unknown chat IDs are skipped.
+    """
+    if not Verification:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    logger.info(f"Bulk lookup of {len(lookup.chat_ids)} chat records")
+    return StreamingResponse(
+        _stream_ndjson(stream_chats_by_chatids, lookup.chat_ids),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get(
+    "/chat/session/{session_id}",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_chats_by_session_api(
+    request: Request,
+    session_id: uuid.UUID,
+    Verification: Annotated[bool, Depends(verification)],
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Stream one page of the chat history of a session, oldest first.
+    To fetch the next page, pass the `id` of the last record as `after_id`;
+    a page with fewer than `limit` records is the last one.
+
+    Args:
+    - request (Request): The incoming request object.
+    - session_id (uuid.UUID): The unique identifier of the session.
+    - after_id (int): The row ID of the last record of the previous page, 0 for the first page.
+    - limit (int): The maximum number of records of the page.
+
+    Returns:
+    - StreamingResponse: Newline-delimited ChatRecordShow records.
+    """
+    if not Verification:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    return StreamingResponse(
+        _stream_ndjson(stream_chats_by_session, session_id, after_id, limit),
+        media_type="application/x-ndjson",
+    )
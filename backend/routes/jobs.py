@@ -0,0 +1,167 @@
+"""
+This module contains the FastAPI routes for asynchronous classification jobs over CSV datasets.
+An uploaded CSV file with a "Question" column, and optionally a "FinalLabel" column, is stored
+and scored by the background job workers in the app state, so the request returns as soon as
+the job is queued. The progress is polled by job id, and the result file is downloaded once
+the job has completed.
+
+Endpoints:
+- POST /api/jobs: Upload a CSV file and queue its classification job.
+- GET /api/jobs/{job_id}: Report the status, progress, rows per second and accuracy of a job.
+- GET /api/jobs/{job_id}/result: Download the CSV file of a completed job with its predictions.
+"""
+
+# Import necessary modules and components
+import logging
+import os
+import uuid
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, status
+from fastapi.responses import FileResponse
+
+from backend.dependencies.auth import verification
+from backend.jobs import JobQueueFull, UploadTooLarge
+from backend.schemas.input import ClassificationJobShow, ErrorResponse
+from src.settings import LoggerSettings
+
+# Setup logger
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+# Initialize router
+router = APIRouter(tags=["jobs"])
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+async def _read_upload(file: UploadFile):
+    """Yields the content of an uploaded file in chunks."""
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        yield chunk
+
+
+async def _get_job(request: Request, job_id: uuid.UUID) -> dict:
+    """Returns the status of a job, or raises 404 if the job is unknown."""
+    job = await request.app.state.job_manager.get(str(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.post(
+    "/api/jobs",
+    response_model=ClassificationJobShow,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        401: {"model": ErrorResponse},
+        413: {"model": ErrorResponse},
+        422: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
+    },
+)
+async def create_job(
+    request: Request,
+    file: UploadFile,
+    Verification: Annotated[bool, Depends(verification)],
+):
+    """
+    Upload a CSV file and queue its classification job.
+
+    Args:
+    - request (Request): The incoming request object.
+    - file (UploadFile): The CSV file, with a Question column and an optional FinalLabel column.
+
+    Returns:
+    - ClassificationJobShow: The queued job, whose job_id is used to poll its progress.
+    """
+    if not Verification:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    try:
+        job = await request.app.state.job_manager.submit(
+            file.filename, _read_upload(file)
+        )
+    except JobQueueFull as ex:
+        logger.warning(f"Rejecting classification job: {ex}")
+        raise HTTPException(status_code=503, detail=str(ex))
+    except UploadTooLarge as ex:
+        raise HTTPException(status_code=413, detail=str(ex))
+    except ValueError as ex:
+        raise HTTPException(status_code=422, detail=str(ex))
+    finally:
+        await file.close()
+
+    return job.to_dict()
+
+
+@router.get(
+    "/api/jobs/{job_id}",
+    response_model=ClassificationJobShow,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+    },
+)
+async def get_job(
+    request: Request,
+    job_id: uuid.UUID,
+    Verification: Annotated[bool, Depends(verification)],
+):
+    """
+    Report the status, progress, rows per second and accuracy of a classification job.
+
+    Args:
+    - request (Request): The incoming request object.
+    - job_id (uuid.UUID): The unique identifier of the job.
+
+    Returns:
+    - ClassificationJobShow: The status of the job.
+    """
+    if not Verification:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    return await _get_job(request, job_id)
+
+
+@router.get(
+    "/api/jobs/{job_id}/result",
+    response_class=FileResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+        409: {"model": ErrorResponse},
+    },
+)
+async def get_job_result(
+    request: Request,
+    job_id: uuid.UUID,
+    Verification: Annotated[bool, Depends(verification)],
+):
+    """
+    Download the CSV file of a completed classification job, with the prediction_label
+    and prediction_probability columns appended to the uploaded columns.
+
+    Args:
+    - request (Request): The incoming request object.
+    - job_id (uuid.UUID): The unique identifier of the job.
+
+    Returns:
+    - FileResponse: The result CSV file.
+    """
+    if not Verification:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    job = await _get_job(request, job_id)
+    if job["status"] != "completed":
+        raise HTTPException(
+            status_code=409, detail=f"Job {job_id} is {job['status']}, not completed"
+        )
+
+    stem = os.path.splitext(job["filename"] or "job")[0]
+    return FileResponse(
+        job["result_path"],
+        media_type="text/csv",
+        filename=f"{stem}_predictions.csv",
+    )
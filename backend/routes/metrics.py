@@ -0,0 +1,125 @@
+"""
+This module defines endpoints that expose runtime metrics of the serving stack.
+The endpoints report the load on the components kept in the app state, so that
+queueing and saturation can be observed without attaching a profiler.
+
+Endpoints:
+- GET /api/metrics/inference: Queue depth and load of the micro-batcher and the inference executor,
+  the number of coalesced duplicate predictions, and the classification jobs per status.
+- GET /api/metrics/cache: Hit ratio, evictions, resident bytes and key ages of the prediction cache,
+  progress of the cache warm-up, and hit rate and shadow agreement
+  of the semantic cache, when enabled.
+- GET /api/metrics/db: Statement, session and new connection timing histograms, pool checkout
+  wait and saturation, and queue depth and flush counters of the write-behind chat record writer.
+"""
+
+# Import necessary modules and components
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from backend.dependencies.auth import verification
+from backend.db import engine_metrics, sessionmanager
+from backend.schemas.input import ErrorResponse
+import logging
+from src.settings import LoggerSettings
+
+# Setup logger
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+# Initialize router
+router = APIRouter(tags=["metrics"])
+
+
+@router.get(
+    "/api/metrics/inference",
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+    },
+)
+async def inference_metrics(
+    request: Request,
+    Verification: Annotated[bool, Depends(verification)],
+):
+    """
+    Report the queue depth and load of the micro-batcher and the inference executor,
+    how many duplicate predictions were coalesced, and the classification jobs and
+    their executor.
+    """
+    if not Verification:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    logger.info("Inference metrics API called")
+    return {
+        "batcher": request.app.state.batcher.stats(),
+        "executor": request.app.state.executor.stats(),
+        "single_flight": request.app.state.single_flight.stats(),
+        "jobs": request.app.state.job_manager.stats(),
+    }
+
+
+@router.get(
+    "/api/metrics/cache",
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+    },
+)
+async def cache_metrics(
+    request: Request,
+    Verification: Annotated[bool, Depends(verification)],
+):
+    """
+    Report the hit ratio, evictions, resident bytes and key-age distribution of the prediction
+    cache, the summary of the cache warm-up, and the hit rate and the shadow agreement
+    of the semantic cache. Disabled components are reported as None.
+    """
+    if not Verification:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    logger.info("Cache metrics API called")
+    semantic_cache = request.app.state.semantic_cache
+    warmup = request.app.state.cache_warmup
+    if warmup is None:
+        warmup_summary = None
+    elif not warmup.done():
+        warmup_summary = {"status": "running"}
+    elif warmup.cancelled() or warmup.exception() is not None:
+        warmup_summary = {"status": "failed"}
+    else:
+        warmup_summary = {"status": "done", **warmup.result()}
+
+    return {
+        "prediction": request.app.state.cache.stats(),
+        "warmup": warmup_summary,
+        "semantic": semantic_cache.stats() if semantic_cache is not None else None,
+    }
+
+
+@router.get(
+    "/api/metrics/db",
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+    },
+)
+async def db_metrics(
+    request: Request,
+    Verification: Annotated[bool, Depends(verification)],
+):
+    """
+    Report the per-statement, per-session and new connection timing histograms, the pool
+    checkout wait and saturation, and the queue depth and the flush counters of the
+    write-behind chat record writer.
+    """
+    if not Verification:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    logger.info("DB metrics API called")
+    return {
+        **engine_metrics.stats(sessionmanager._engine.pool),
+        "write_behind": request.app.state.chat_writer.stats(),
+    }
@@ -1,16 +1,34 @@
 """
 This module contains the FastAPI route for performing prediction on user input data.
-The route receives a user query and performs prediction using the model loaded in the app state.
-The prediction results are stored in the cache and the database.
+The route receives a user query and performs prediction through the micro-batcher in the app state,
+which groups concurrent queries into a single forward pass of the loaded model on the inference executor.
+When the inference queue is full the route answers 503 so that clients back off.
+When the semantic cache is enabled, near-duplicates of answered queries reuse their prediction,
+and a sample of those hits is checked against the full classifier after the response. The query
+is embedded and searched in the index on the inference executor, off the event loop.
+Concurrent identical queries are coalesced, so only the first one runs the prediction.
+An answer reused from the cache or from a coalesced prediction is a new chat record of the caller,
+with its own chat id, and is saved like the others.
+The prediction results are stored in the two-tier cache (in-process L1, shared Redis L2),
+and the finished record is handed to the chat record writer, which persists it in bulk INSERTs
+(write-behind) or, in sync mode, in a single upsert statement.
 The route returns the prediction results to the user.
+
+The batch route takes many queries at once: it looks all of them up in the cache in one pass,
+scores only the misses in one batched call of the model on the inference executor, persists
+the records of all queries in bulk and returns the results in input order.
 """
 
-from fastapi import APIRouter, status, Request, HTTPException, Depends
-from backend.dependencies.core import DBSessionDep as db_session
-from backend.crud.chat import create_chat, update_chat_by_chatid
+from fastapi import APIRouter, BackgroundTasks, status, Request, HTTPException, Depends
 import uuid
-from backend.schemas.input import UserInputCreate, PredictionInputShow, ErrorResponse
+from backend.schemas.input import (
+    UserInputCreate,
+    BatchUserInputCreate,
+    PredictionInputShow,
+    ErrorResponse,
+)
 import logging
+from src.executor import InferenceQueueFull
 from src.settings import LoggerSettings
 from backend.dependencies.auth import security, verification
 from typing import Annotated
@@ -20,25 +38,64 @@ logger = logging.getLogger(LoggerSettings().logger_name)
 router = APIRouter(tags=["prediction"])
 
 
+def _record_for_caller(record: dict, user_query: str, session_id) -> dict:
+    """A copy of a stored prediction, which may come from a differently written query,
+    as a new chat record of the caller's own query text and session."""
+    return {
+        **record,
+        "user_query": user_query,
+        "session_id": session_id,
+        "chat_id": uuid.uuid4(),
+    }
+
+
+async def _answer_with_query(
+    request: Request, user_chat: UserInputCreate, record: dict
+) -> PredictionInputShow:
+    """Answer with a stored prediction under a new chat id, saved like any other answer
+    so that it shows in the session history of the caller."""
+    caller_record = _record_for_caller(
+        record, user_chat.user_query, user_chat.session_id
+    )
+    await request.app.state.chat_writer.submit(dict(caller_record))
+    return PredictionInputShow(**caller_record)
+
+
+async def _shadow_check(request: Request, user_query: str, reused_label: str):
+    """Score a semantic cache hit with the full classifier and record the agreement."""
+    try:
+        prediction_result = await request.app.state.batcher.predict(user_query)
+    except InferenceQueueFull:
+        return
+    request.app.state.semantic_cache.record_shadow(
+        reused_label, prediction_result["prediction_label"]
+    )
+
+
 @router.post(
     "/api/predict",
     response_model=PredictionInputShow,
     status_code=status.HTTP_200_OK,
-    responses={422: {"model": ErrorResponse}, 500: {"model": ErrorResponse}},
+    responses={
+        422: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
+    },
 )
 async def do_predict(
     request: Request,
     user_chat: UserInputCreate,
-    db: db_session,
+    background_tasks: BackgroundTasks,
     Verification: Annotated[bool, Depends(verification)],
 ):
     """
     Perform prediction on the user input data and store the results in the cache and database.
+    Duplicates of a query that is already being predicted wait for that prediction instead.
 
     Args:
     - request (Request): The incoming request object.
     - user_chat (UserInputCreate): The user input data for prediction.
-    - db (db_session): The database session.
+    - background_tasks (BackgroundTasks): Runs the shadow checks of semantic cache hits.
 
     Returns:
     - PredictionInputShow: The prediction results.
@@ -52,38 +109,171 @@ async def do_predict(
         user_chat.session_id = uuid.uuid4()
 
     cache = request.app.state.cache
+    cache_key = cache.key(user_chat.user_query)
 
-    # Check if the result is already in the cache
-    result = cache.get(user_chat.user_query)
+    # Check if the result is already in the cache, keyed on the canonical query
+    result = await cache.get(cache_key)
     if result is not None:
         logger.info(f"Cache hit for query: {user_chat.user_query}")
-        return PredictionInputShow(**result)
+        return await _answer_with_query(request, user_chat, result)
+
+    # Optionally reuse the prediction of a near-duplicate query
+    semantic_cache = request.app.state.semantic_cache
+    embedding = None
+    if semantic_cache is not None:
+        # the embedding and the index search run on the executor, off the event loop
+        try:
+            embedding, result = await request.app.state.executor.run(
+                semantic_cache.match, user_chat.user_query
+            )
+        except InferenceQueueFull as ex:
+            logger.warning(f"Rejecting query due to backpressure: {ex}")
+            raise HTTPException(status_code=503, detail=str(ex))
+        if result is not None:
+            logger.info(f"Semantic cache hit for query: {user_chat.user_query}")
+            if semantic_cache.should_shadow():
+                background_tasks.add_task(
+                    _shadow_check,
+                    request,
+                    user_chat.user_query,
+                    result["prediction_label"],
+                )
+            return await _answer_with_query(request, user_chat, result)
 
     logger.info(f"Cache miss for query: {user_chat.user_query}. Performing prediction.")
 
-    updated_record = user_chat.dict()
-    updated_record["chat_id"] = uuid.uuid4()
+    async def predict_and_store():
+        updated_record = user_chat.dict()
+        updated_record["chat_id"] = uuid.uuid4()
 
-    # Create a new record in the database
-    await create_chat(db, updated_record)
+        # Perform prediction through the micro-batcher in app state
+        batcher = request.app.state.batcher
+        try:
+            prediction_result = await batcher.predict(user_chat.user_query)
+        except InferenceQueueFull as ex:
+            logger.warning(f"Rejecting query due to backpressure: {ex}")
+            raise HTTPException(status_code=503, detail=str(ex))
+        logger.info(f"Prediction result: {prediction_result}")
 
-    # Extract model from app state and perform prediction
-    model = request.app.state.model
-    prediction_result = model.predict(user_chat.user_query)
-    logger.info(f"Prediction result: {prediction_result}")
+        # Update the record with prediction results
+        updated_record.update(
+            {
+                "prediction_label": prediction_result["prediction_label"],
+                "prediction_probability": prediction_result["prediction_probability"],
+                "status": "completed",
+            }
+        )
 
-    # Update the record with prediction results
-    updated_record.update(
-        {
-            "prediction_label": prediction_result["prediction_label"],
-            "prediction_probability": prediction_result["prediction_probability"],
-            "status": "completed",
-        }
-    )
+        # Hand the finished record to the writer: queued for a bulk INSERT,
+        # or upserted right away in sync mode
+        await request.app.state.chat_writer.submit(dict(updated_record))
 
-    await update_chat_by_chatid(db, updated_record)
+        # Store the result in the cache
+        await cache.set(cache_key, updated_record)
+        if embedding is not None:
+            semantic_cache.add(embedding, updated_record)
+        return updated_record
 
-    # Store the result in the cache
-    cache[user_chat.user_query] = updated_record
+    # Identical queries in flight share one prediction
+    updated_record, shared = await request.app.state.single_flight.do(
+        cache_key, predict_and_store
+    )
+    if shared:
+        logger.info(f"Coalesced with in-flight prediction: {user_chat.user_query}")
+        return await _answer_with_query(request, user_chat, updated_record)
 
     return PredictionInputShow(**updated_record)
+
+
+@router.post(
+    "/api/predict/batch",
+    response_model=list[PredictionInputShow],
+    status_code=status.HTTP_200_OK,
+    responses={
+        422: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
+    },
+)
+async def do_predict_batch(
+    request: Request,
+    user_chats: BatchUserInputCreate,
+    Verification: Annotated[bool, Depends(verification)],
+):
+    """
+    Perform prediction on a batch of user queries and store the new results in the cache and database.
+
+    Args:
+    - request (Request): The incoming request object.
+    - user_chats (BatchUserInputCreate): The user queries and their shared session ID.
+
+    Returns:
+    - list[PredictionInputShow]: The prediction results, in the order of the queries.
+    """
+    if not Verification:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    if not user_chats.session_id:
+        user_chats.session_id = uuid.uuid4()
+    queries = user_chats.user_queries
+    logger.info(f"Received batch of {len(queries)} user queries")
+
+    cache = request.app.state.cache
+    cache_keys = [cache.key(query) for query in queries]
+
+    # Look up all queries at once, then score each distinct missing key a single time
+    results = await cache.get_many(cache_keys)
+    misses = {}
+    for query, key, result in zip(queries, cache_keys, results):
+        if result is None:
+            misses.setdefault(key, query)
+    logger.info(
+        f"Batch cache hits: {len(queries) - len(misses)}, misses: {len(misses)}"
+    )
+
+    records = {}
+    if misses:
+        model = request.app.state.model
+        try:
+            predictions = await request.app.state.executor.run(
+                model.predict, list(misses.values())
+            )
+        except InferenceQueueFull as ex:
+            logger.warning(f"Rejecting batch due to backpressure: {ex}")
+            raise HTTPException(status_code=503, detail=str(ex))
+
+        records = {
+            key: {
+                "user_query": query,
+                "session_id": user_chats.session_id,
+                "chat_id": uuid.uuid4(),
+                "status": "completed",
+                "prediction_label": prediction["prediction_label"],
+                "prediction_probability": prediction["prediction_probability"],
+            }
+            for (key, query), prediction in zip(misses.items(), predictions)
+        }
+        await cache.set_many(records)
+
+    # The first query of each scored key answers with its new record, cache hits and
+    # repeated queries with a copy under their own chat id
+    answers = []
+    answered = set()
+    new_records = list(records.values())
+    for query, key, result in zip(queries, cache_keys, results):
+        if result is None and key not in answered:
+            answered.add(key)
+            answers.append(records[key])
+            continue
+        record = _record_for_caller(
+            result if result is not None else records[key],
+            query,
+            user_chats.session_id,
+        )
+        answers.append(record)
+        new_records.append(record)
+
+    await request.app.state.chat_writer.submit_many(
+        [dict(record) for record in new_records]
+    )
+    return [PredictionInputShow(**record) for record in answers]
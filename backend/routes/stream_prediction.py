@@ -0,0 +1,188 @@
+"""
+This module contains the FastAPI route for streaming bulk classification of newline-delimited questions.
+The request body is read incrementally, the questions are scored in internal batches of the
+loaded model on the inference executor, and the predictions are written back as newline-delimited
+JSON while the rest of the body is still being uploaded. At most one batch of questions and one
+partial line are held in memory, whatever the size of the payload.
+
+Each input line is either a JSON object with a "user_query" field or a JSON string. Each output
+line carries the 1-based input line number and the prediction, or an "error" for an invalid line.
+The results are not cached or persisted, the route is meant for backfills.
+
+Endpoints:
+- POST /api/predict/stream: Classify a stream of NDJSON questions into a stream of NDJSON predictions.
+"""
+
+# Import necessary modules and components
+import json
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+
+from backend.dependencies.auth import verification
+from backend.schemas.input import ErrorResponse
+from src.settings import LoggerSettings, StreamSettings
+
+# Setup logger
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+# Initialize router
+router = APIRouter(tags=["prediction"])
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose content reads the request body while it is sent.
+    The disconnect listener of StreamingResponse is skipped, because it would consume the body
+    messages; a client disconnect surfaces as ClientDisconnect from the request stream instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _read_lines(request: Request, max_line_bytes: int):
+    """
+    Split the request body into lines as its chunks arrive.
+
+    Yields:
+    - tuple: The 1-based line number and the line, or None for a line longer than `max_line_bytes`.
+    """
+    buffer = b""
+    line_no = 0
+    skipping = False
+    async for chunk in request.stream():
+        buffer += chunk
+        while True:
+            end = buffer.find(b"\n")
+            if end < 0:
+                break
+            line, buffer = buffer[:end], buffer[end + 1 :]
+            line_no += 1
+            # a whole line may arrive within one chunk, its length is checked here too
+            oversized = skipping or len(line) > max_line_bytes
+            yield line_no, None if oversized else line
+            skipping = False
+        if len(buffer) > max_line_bytes and not skipping:
+            # keep reading until the end of the oversized line without holding it
+            skipping = True
+        if skipping:
+            buffer = b""
+    if buffer.strip() or skipping:
+        oversized = skipping or len(buffer) > max_line_bytes
+        yield line_no + 1, None if oversized else buffer
+
+
+def _parse_line(line: bytes) -> str:
+    """
+    Returns the question of an input line.
+
+    Raises:
+    - ValueError: If the line is not a JSON string or an object with a string "user_query".
+    """
+    value = json.loads(line)
+    if isinstance(value, dict):
+        value = value.get("user_query")
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError('expected a JSON string or an object with a "user_query"')
+    return value
+
+
+async def _score_stream(request: Request, batch_size: int, max_line_bytes: int):
+    """
+    Read, batch, score and serialize the questions of the request body.
+
+    Yields:
+    - str: One NDJSON line per non-empty input line.
+    """
+    model = request.app.state.model
+    executor = request.app.state.executor
+    # entries of (line number, question, error), errors keep their place in the output order
+    batch = []
+    pending = 0
+    scored = 0
+
+    async def flush():
+        # wait for a free slot of the executor rather than failing a long stream half way
+        queries = [query for _, query, error in batch if error is None]
+        predictions = iter(
+            await executor.run(model.predict, queries, block=True) if queries else []
+        )
+        return "".join(
+            json.dumps(
+                {"line": line_no, "error": error}
+                if error is not None
+                else {"line": line_no, **next(predictions)}
+            )
+            + "\n"
+            for line_no, _, error in batch
+        )
+
+    try:
+        async for line_no, line in _read_lines(request, max_line_bytes):
+            if line is not None and not line.strip():
+                continue
+            try:
+                if line is None:
+                    raise ValueError(f"line longer than {max_line_bytes} bytes")
+                batch.append((line_no, _parse_line(line), None))
+                pending += 1
+            except ValueError as ex:
+                batch.append((line_no, None, str(ex)))
+
+            if pending >= batch_size or len(batch) >= 2 * batch_size:
+                yield await flush()
+                scored += pending
+                batch, pending = [], 0
+
+        if batch:
+            yield await flush()
+            scored += pending
+    except ClientDisconnect:
+        logger.warning(
+            f"Client disconnected from the prediction stream after {scored} questions"
+        )
+        return
+
+    logger.info(f"Prediction stream finished after {scored} questions")
+
+
+@router.post(
+    "/api/predict/stream",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+    },
+)
+async def do_predict_stream(
+    request: Request,
+    Verification: Annotated[bool, Depends(verification)],
+):
+    """
+    Classify a stream of newline-delimited questions into a stream of newline-delimited predictions.
+
+    Args:
+    - request (Request): The incoming request object, whose body is read as a stream.
+
+    Returns:
+    - StreamingResponse: One JSON line per input question, in input order.
+    """
+    if not Verification:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    logger.info("Starting prediction stream")
+    return BodyStreamingResponse(
+        _score_stream(
+            request,
+            StreamSettings().stream_batch_size,
+            StreamSettings().stream_max_line_bytes,
+        ),
+        media_type="application/x-ndjson",
+    )
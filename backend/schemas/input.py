@@ -6,13 +6,19 @@ Models:
 - UserInputCreate: Model for creating user input with user query and session ID.
 - UserInputShow: Model for showing user input with additional chat ID and status.
 - PredictionInputShow: Model for showing prediction results with label and probability.
+- ChatRecordShow: Model for showing a stored chat record with its row ID.
+- ChatIdsLookup: Model for looking up many chat records by their chat IDs.
+- BatchUserInputCreate: Model for creating a batch of user queries of one session.
+- ClassificationJobShow: Model for showing the progress and results of a CSV classification job.
 - ErrorResponse: Model for error responses in the API.
 """
 
 # Import necessary modules and components
+from datetime import datetime
 from typing import Optional, Union
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 import uuid
+from src.settings import BatcherSettings
 
 
 class UserInputCreate(BaseModel):
@@ -54,6 +60,84 @@ class PredictionInputShow(UserInputShow):
     prediction_probability: Union[float, None]
 
 
+class ChatRecordShow(PredictionInputShow):
+    """
+    Model for showing a stored chat record.
+
+    Attributes:
+    - id (int): The row ID of the record, used as the cursor of the session history.
+    """
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+
+
+class ChatIdsLookup(BaseModel):
+    """
+    Model for looking up many chat records at once.
+
+    Attributes:
+    - chat_ids (list[uuid.UUID]): The chat identifiers to look up, at most 5000.
+    """
+
+    chat_ids: list[uuid.UUID] = Field(min_length=1, max_length=5000)
+
+
+class BatchUserInputCreate(BaseModel):
+    """
+    Model for creating a batch of user inputs.
+
+    Attributes:
+    - user_queries (list[str]): The user's query strings, at most `max_request_queries` of them.
+    - session_id (Union[uuid.UUID, None]): The unique session identifier shared by the queries.
+    """
+
+    user_queries: list[str] = Field(
+        min_length=1, max_length=BatcherSettings().max_request_queries
+    )
+    session_id: Union[uuid.UUID, None] = None
+
+
+class ClassificationJobShow(BaseModel):
+    """
+    Model for showing a CSV classification job.
+
+    Attributes:
+    - job_id (uuid.UUID): The unique job identifier.
+    - filename (Union[str, None]): The name of the uploaded file.
+    - status (str): The job status, "queued", "running", "completed" or "failed".
+    - created_at (datetime): When the job was submitted.
+    - started_at (Union[datetime, None]): When the scoring started.
+    - finished_at (Union[datetime, None]): When the scoring completed or failed.
+    - total_rows (Union[int, None]): The number of rows of the file, once counted.
+    - processed_rows (int): The number of rows scored so far.
+    - progress (Union[float, None]): The fraction of the rows scored so far.
+    - rows_per_second (Union[float, None]): The scoring throughput of the job.
+    - labeled_rows (int): The number of scored rows with a FinalLabel.
+    - correct_rows (int): The number of labeled rows predicted as their FinalLabel.
+    - accuracy (Union[float, None]): The accuracy against FinalLabel, when the file has one.
+    - result_path (Union[str, None]): The location of the result file, once completed.
+    - error (Union[str, None]): The reason of the failure, if the job failed.
+    """
+
+    job_id: uuid.UUID
+    filename: Union[str, None]
+    status: str
+    created_at: datetime
+    started_at: Union[datetime, None]
+    finished_at: Union[datetime, None]
+    total_rows: Union[int, None]
+    processed_rows: int
+    progress: Union[float, None]
+    rows_per_second: Union[float, None]
+    labeled_rows: int
+    correct_rows: int
+    accuracy: Union[float, None]
+    result_path: Union[str, None]
+    error: Union[str, None]
+
+
 # Uncomment the InferenceResponse class if it is needed in the future
 # class InferenceResponse(BaseModel):
 #     """
@@ -0,0 +1,248 @@
+"""
+This module provides the write-behind persistence of chat records.
+Finished prediction records are buffered in memory and written to the database in bulk INSERTs,
+so the prediction route does not wait on database round trips.
+
+Components:
+- ChatRecordWriter: Buffers chat records and flushes them on a size or time trigger.
+
+Persist modes:
+- write_behind: The route returns as soon as the record is queued. Records still queued
+  when the process dies are lost.
+- group_commit: The route waits until the bulk INSERT holding its record is committed,
+  which keeps the batching but reports the write before answering.
+- sync: The route writes its record itself, in one upsert statement, without the queue.
+"""
+
+# Import necessary modules and components
+import asyncio
+import logging
+import time
+
+from backend.crud.chat import create_chats_bulk, upsert_chat
+from src.settings import LoggerSettings, WriteBehindSettings
+
+# Setup logger
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+PERSIST_MODES = ("write_behind", "group_commit", "sync")
+
+
+class ChatRecordWriter:
+    """
+    Write-behind queue for chat records.
+
+    Attributes:
+    - sessionmanager (DatabaseSessionManager): Provides the sessions used for the flushes.
+    - mode (str): The persist mode, "write_behind", "group_commit" or "sync".
+    - max_batch (int): The number of queued records that triggers a flush.
+    - flush_interval_ms (float): The maximum time a record waits in the queue before a flush.
+    - max_queue (int): The maximum number of queued records, submitting waits when it is reached.
+    - max_retries (int): The number of attempts of a failing flush before its records are dropped.
+    """
+
+    def __init__(
+        self,
+        sessionmanager,
+        mode: str = WriteBehindSettings().persist_mode,
+        max_batch: int = WriteBehindSettings().persist_max_batch,
+        flush_interval_ms: float = WriteBehindSettings().persist_flush_interval_ms,
+        max_queue: int = WriteBehindSettings().persist_max_queue,
+        max_retries: int = WriteBehindSettings().persist_max_retries,
+    ):
+        if mode not in PERSIST_MODES:
+            raise ValueError(f"Unknown persist mode {mode}")
+        self.sessionmanager = sessionmanager
+        self.mode = mode
+        self.max_batch = max_batch
+        self.flush_interval_ms = flush_interval_ms
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self._queue = None
+        self._worker = None
+        self._pending = []
+        self._flushing = None
+        self.flushed_records = 0
+        self.flushed_batches = 0
+        self.failed_records = 0
+        self.last_flush_ms = None
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of records waiting to be written."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """
+        Start the background task that flushes the queue.
+        """
+        logger.info(
+            f"Starting chat record writer in {self.mode} mode with batches of {self.max_batch} "
+            f"and a flush interval of {self.flush_interval_ms} ms"
+        )
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background task and flush every record still queued.
+        """
+        if self._worker is None:
+            return
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        if self._flushing is not None:
+            await self._flushing
+
+        # records taken from the queue by an interrupted collect are flushed first
+        while self._pending or not self._queue.empty():
+            while len(self._pending) < self.max_batch and not self._queue.empty():
+                self._pending.append(self._queue.get_nowait())
+            batch, self._pending = self._pending, []
+            await self._flush(batch)
+        logger.info("Chat record writer stopped with an empty queue")
+
+    async def submit(self, chat_dict: dict):
+        """
+        Queue a finished chat record for writing, or write it right away in sync mode.
+
+        Args:
+        - chat_dict (dict): The chat record details.
+
+        Raises:
+        - Exception: In group_commit and sync mode, if the write of the record failed.
+        """
+        if self._worker is None:
+            raise RuntimeError("ChatRecordWriter is not started")
+
+        if self.mode == "sync":
+            async with self.sessionmanager.session() as session:
+                await upsert_chat(session, chat_dict)
+            self.flushed_records += 1
+            return
+
+        future = None
+        if self.mode == "group_commit":
+            future = asyncio.get_running_loop().create_future()
+        await self._queue.put((chat_dict, future))
+        if future is not None:
+            await future
+
+    async def submit_many(self, chat_dicts: list[dict]):
+        """
+        Queue many finished chat records for writing, or write them right away in one bulk
+        INSERT in sync mode.
+
+        Args:
+        - chat_dicts (list[dict]): The chat record details.
+
+        Raises:
+        - Exception: In group_commit and sync mode, if the write of the records failed.
+        """
+        if self._worker is None:
+            raise RuntimeError("ChatRecordWriter is not started")
+
+        if self.mode == "sync":
+            async with self.sessionmanager.session() as session:
+                await create_chats_bulk(session, chat_dicts)
+            self.flushed_records += len(chat_dicts)
+            return
+
+        futures = []
+        for chat_dict in chat_dicts:
+            future = None
+            if self.mode == "group_commit":
+                future = asyncio.get_running_loop().create_future()
+                futures.append(future)
+            await self._queue.put((chat_dict, future))
+        if futures:
+            await asyncio.gather(*futures)
+
+    def stats(self) -> dict:
+        """
+        Returns the queue depth and the flush counters of the writer.
+        """
+        return {
+            "mode": self.mode,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "flushed_records": self.flushed_records,
+            "flushed_batches": self.flushed_batches,
+            "failed_records": self.failed_records,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+    async def _collect(self):
+        """
+        Wait for the first record, then gather more into the pending batch until it is full
+        or the interval expires.
+        """
+        loop = asyncio.get_running_loop()
+        batch = self._pending
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.flush_interval_ms / 1000
+
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _flush(self, batch: list):
+        """
+        Write a batch in one bulk INSERT, retrying failed attempts, and resolve its waiters.
+        """
+        records = [chat_dict for chat_dict, _ in batch]
+        error = None
+        for attempt in range(1, self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                async with self.sessionmanager.session() as session:
+                    await create_chats_bulk(session, records)
+            except Exception as ex:
+                error = ex
+                logger.warning(
+                    f"Bulk insert of {len(records)} chat records failed "
+                    f"(attempt {attempt}/{self.max_retries}): {ex}"
+                )
+                await asyncio.sleep(0.1 * attempt)
+                continue
+
+            error = None
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.flushed_records += len(records)
+            self.flushed_batches += 1
+            break
+
+        if error is not None:
+            self.failed_records += len(records)
+            logger.error(f"Dropping {len(records)} chat records after failed flushes")
+
+        for _, future in batch:
+            if future is None or future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    async def _run(self):
+        while True:
+            await self._collect()
+            batch, self._pending = self._pending, []
+            # shield the flush so a stop does not interrupt a bulk INSERT half way
+            self._flushing = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._flushing)
+            self._flushing = None
@@ -0,0 +1,60 @@
+"""
+Gunicorn configuration for the Question Classifier API.
+
+The number of workers is taken from WEB_CONCURRENCY (default 1). With MODEL_PRELOAD enabled,
+the app is imported once in the master process, which loads the model weights before the
+workers are forked. The workers then share those weights copy-on-write instead of each one
+loading its own copy through model_startup(). The preloaded weights are kept on CPU, since a
+CUDA context cannot be used across fork() and only CPU memory is shared copy-on-write.
+
+The database tables are created once by the master in either mode, before the workers start,
+so that the workers never drop and create them concurrently (DB_RESET_ON_STARTUP).
+
+Usage:
+- gunicorn main:app -c gunicorn.conf.py
+"""
+
+import asyncio
+import gc
+import os
+
+from src.settings import env_settings
+
+bind = "0.0.0.0:8080"
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 1800
+preload_app = env_settings.MODEL_PRELOAD
+
+
+def on_starting(server):
+    """
+    Create the database tables in the master. In preload mode, importing the app already did.
+    The forked workers inherit the created state and skip the table creation.
+    """
+    from backend.db import init_db_before_fork
+
+    asyncio.run(init_db_before_fork())
+    server.log.info("Created DB tables before starting workers")
+
+
+def when_ready(server):
+    """
+    Freeze the objects created while preloading, so that the garbage collector of the
+    workers never writes to their memory pages and breaks copy-on-write sharing.
+    """
+    if preload_app:
+        gc.freeze()
+        server.log.info("Froze preloaded objects before forking workers")
+
+
+def post_fork(server, worker):
+    """
+    Split the CPU cores between the workers, so that the torch thread pools of the
+    workers do not oversubscribe the machine.
+    """
+    import torch
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    torch.set_num_threads(threads)
+    server.log.info(f"Worker {worker.pid} uses {threads} torch threads")
@@ -2,29 +2,54 @@
 Main API Endpoint for the Question Classifier API.
 This file initializes the FastAPI server and includes the routers for the API.
 The startup event initializes the database tables and the model.
+With MODEL_PRELOAD enabled (gunicorn preload mode, see gunicorn.conf.py), the model is loaded
+once at import time in the master process instead, so that the forked workers serve from one
+copy-on-write copy of the model weights. Under gunicorn the database tables are always created
+once by the master, never by the workers.
 
 The API includes the following routers:
 1. status_check: A router to check the status of the API.
 2. system_info: A router to get system information.
 3. chat: A router to interact with the chat records in the database.
-4. prediction: A router to perform predictions using the loaded model.
+4. chat_history: A router to look up chat records in bulk and page through session histories.
+5. prediction: A router to perform predictions using the loaded model.
+6. stream_prediction: A router to classify a stream of newline-delimited questions.
+7. jobs: A router to run asynchronous classification jobs over uploaded CSV datasets.
+8. metrics: A router to report runtime metrics of the serving stack.
 
 The API server is started using the uvicorn library.
 """
 
+import asyncio
 import time
 from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-
-from backend.db import sessionmanager, Base
-from backend.routes import prediction, system_info, status_check, chat
+from starlette.datastructures import MutableHeaders
+
+from backend.cache_warmup import warm_up_cache
+from backend.db import init_db, init_db_before_fork, sessionmanager
+from backend.jobs import JobManager
+from backend.write_behind import ChatRecordWriter
+from backend.routes import (
+    prediction,
+    stream_prediction,
+    system_info,
+    status_check,
+    chat,
+    chat_history,
+    jobs,
+    metrics,
+)
+from src.batcher import MicroBatcher
+from src.cache import SingleFlight, create_prediction_cache
+from src.executor import InferenceExecutor
+from src.semantic_cache import create_semantic_cache
 from src.model_startup import model_startup
-from src.settings import LoggerSettings
-from src.utils.logger import setup_logging
-from cachetools import TTLCache
+from src.settings import CacheWarmupSettings, LoggerSettings, env_settings
+from src.utils.logger import log_duration, setup_logging
 
 # Setup logging
 logger = setup_logging(
@@ -34,29 +59,95 @@ logger = setup_logging(
 )
 
 
+# In preload mode the model is loaded before the workers are forked. Compilation and warmup
+# still run per worker in the lifespan, so the master never starts torch's thread pools.
+# The weights stay on CPU: a CUDA context does not survive fork(), and only CPU tensors
+# are shared copy-on-write anyway.
+preloaded_model = None
+if env_settings.MODEL_PRELOAD:
+    logger.info("Preloading model and DB tables on CPU before forking workers")
+    preloaded_model = model_startup(compile_mode="none", device="cpu")
+    asyncio.run(init_db_before_fork())
+
+
 # Initialize the model startup context manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Initialize the model and create the database tables on startup of the API server,
-    and create a cache.
+    and create the two-tier prediction cache (in-process L1 in front of a shared Redis L2)
+    with single-flight coalescing of identical in-flight predictions, and the optional
+    semantic cache of near-duplicate queries. The cache is warmed up in the background
+    from the frequent chat records and the evaluation and labeled questions.
+    Finished chat records are persisted by a write-behind writer, which is flushed on shutdown.
+    Uploaded CSV classification jobs are scored by background job workers on the inference
+    executor whenever it is idle, giving way to the live predictions.
+    Forward passes run on a bounded inference executor, and a micro-batcher is started
+    in front of it so that concurrent predictions share a single forward pass.
+    The model is warmed up on the executor before the app starts taking traffic.
+    When the model was preloaded in the master process, it is reused instead of loaded again.
     """
-    logger.info("Executing Model Startup")
-    model = model_startup()
+    if preloaded_model is not None:
+        logger.info("Using model preloaded in the master process")
+        model = preloaded_model
+        model.compile(env_settings.MODEL_COMPILE)
+    else:
+        logger.info("Executing Model Startup")
+        model = model_startup()
     app.state.model = model
 
-    logger.info("Creating DB Tables")
-    async with sessionmanager._engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
-
-    logger.info(
-        "Initializing cache with a maximum size of 100 entries and a TTL of 60 seconds"
-    )
-    app.state.cache = TTLCache(maxsize=100, ttl=60)
+    logger.info("Starting inference executor and micro-batcher")
+    app.state.executor = InferenceExecutor()
+    app.state.batcher = MicroBatcher(model, app.state.executor)
+    await app.state.batcher.start()
+
+    logger.info("Warming up the model over representative batch and sequence shapes")
+    with log_duration(logger, "model warmup"):
+        await app.state.executor.run(model.warmup, block=True)
+
+    # a no-op in workers forked from a gunicorn master, which created the tables once
+    with log_duration(logger, "DB table creation"):
+        await init_db()
+
+    app.state.cache = create_prediction_cache(model)
+    app.state.semantic_cache = create_semantic_cache(model)
+    app.state.single_flight = SingleFlight()
+
+    app.state.chat_writer = ChatRecordWriter(sessionmanager)
+    await app.state.chat_writer.start()
+
+    app.state.job_manager = JobManager(model, app.state.executor)
+    await app.state.job_manager.start()
+
+    # Warm the cache in the background, the app takes traffic meanwhile
+    app.state.cache_warmup = None
+    if CacheWarmupSettings().cache_warmup_enabled:
+        app.state.cache_warmup = asyncio.create_task(
+            warm_up_cache(
+                model,
+                app.state.executor,
+                app.state.cache,
+                app.state.semantic_cache,
+            )
+        )
 
     yield
 
+    if app.state.cache_warmup is not None and not app.state.cache_warmup.done():
+        logger.info("Cancelling unfinished cache warm-up")
+        app.state.cache_warmup.cancel()
+
+    logger.info("Stopping classification job workers")
+    await app.state.job_manager.stop()
+
+    logger.info("Stopping micro-batcher and inference executor")
+    await app.state.batcher.stop()
+    app.state.executor.shutdown()
+
+    logger.info("Flushing queued chat records")
+    await app.state.chat_writer.stop()
+    await app.state.cache.close()
+
 
 # Initialize API Server
 app = FastAPI(
@@ -77,21 +168,47 @@ app.add_middleware(
 
 
 # Adding time middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    """Add a header with the process time for each request."""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = f"{process_time:.3f}"
-    return response
+class ProcessTimeMiddleware:
+    """
+    Add a header with the process time for each request, measured until the response starts.
+
+    Written as a plain ASGI middleware rather than with `@app.middleware("http")`: the latter
+    listens for disconnects on the request channel while the response streams, which steals
+    the body chunks of the streaming upload route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.time()
+
+        async def send_with_process_time(message):
+            if message["type"] == "http.response.start":
+                process_time = time.time() - start_time
+                headers = MutableHeaders(scope=message)
+                headers["X-Process-Time"] = f"{process_time:.3f}"
+            await send(message)
+
+        await self.app(scope, receive, send_with_process_time)
+
+
+app.add_middleware(ProcessTimeMiddleware)
 
 
 # Include routers in the API
 # app.include_router(status_check.router)
 # app.include_router(system_info.router)
 # app.include_router(chat.router)
+app.include_router(chat_history.router)
 app.include_router(prediction.router)
+app.include_router(stream_prediction.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     # Start the API server
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+
+from src.executor import InferenceQueueFull
+from src.settings import BatcherSettings, LoggerSettings
+
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-query predictions into one batched forward pass.
+
+    Requests are queued and grouped until either `max_batch_size` queries are
+    waiting or `max_wait_ms` has elapsed since the first query of the batch arrived.
+    The batch is then scored with a single call to `ModelInference.predict` on the
+    inference executor, and each result is handed back to the request that submitted it.
+    A new batch is only formed once a worker of the executor is free, so queries that
+    arrive during a forward pass are picked up together by the next batch.
+
+    Attributes:
+        model (ModelInference): The loaded model used for batched prediction.
+        executor (InferenceExecutor): The executor that runs the forward passes.
+        max_batch_size (int): The maximum number of queries scored together.
+        max_wait_ms (float): The maximum time a query waits for a batch to fill.
+        max_queue (int): The maximum number of queries waiting to be batched.
+    """
+
+    def __init__(
+        self,
+        model,
+        executor,
+        max_batch_size: int = BatcherSettings().max_batch_size,
+        max_wait_ms: float = BatcherSettings().max_wait_ms,
+        max_queue: int = BatcherSettings().max_queue,
+    ):
+        self.model = model
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        self._queue = None
+        self._worker = None
+        self._batch_slots = None
+        self._batches = set()
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of queries waiting to be put into a batch."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Start the background task that drains the queue into batches."""
+        logger.info(
+            f"Starting micro-batcher with max batch size {self.max_batch_size} "
+            f"and max wait {self.max_wait_ms} ms"
+        )
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._batch_slots = asyncio.Semaphore(self.executor.max_workers)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and fail any query still waiting for a batch."""
+        if self._worker is None:
+            return
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("MicroBatcher has been stopped"))
+
+    async def predict(self, user_query: str) -> dict:
+        """
+        Queue a single query and wait for its prediction.
+
+        Args:
+            user_query (str): The user query to classify.
+
+        Returns:
+            dict: The prediction result, shaped like `ModelInference.predict` for a string.
+
+        Raises:
+            InferenceQueueFull: If `max_queue` queries are already waiting.
+        """
+        if self._worker is None:
+            raise RuntimeError("MicroBatcher is not started")
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((user_query, future))
+        except asyncio.QueueFull:
+            raise InferenceQueueFull(
+                f"Micro-batcher queue is full ({self.max_queue} queries waiting)"
+            )
+        return await future
+
+    def stats(self) -> dict:
+        """Returns the current load of the micro-batcher."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_queue": self.max_queue,
+            "queue_depth": self.queue_depth,
+            "batches_in_flight": len(self._batches),
+        }
+
+    async def _collect(self) -> list:
+        """Wait for the first query, then gather more until the batch is full or the wait expires."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _score(self, batch: list):
+        """Run one batch on the executor and resolve the futures of its queries."""
+        try:
+            logger.info(f"Scoring micro-batch of size {len(batch)}")
+            results = await self.executor.run(
+                self.model.predict,
+                [query for query, _ in batch],
+                len(batch),
+                block=True,
+            )
+        except Exception as ex:
+            logger.exception(f"Micro-batch prediction failed due to {ex}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(ex)
+            return
+        finally:
+            self._batch_slots.release()
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self):
+        while True:
+            await self._batch_slots.acquire()
+            try:
+                batch = await self._collect()
+            except asyncio.CancelledError:
+                self._batch_slots.release()
+                raise
+
+            # drop queries whose callers have already gone away
+            batch = [(query, future) for query, future in batch if not future.done()]
+            if not batch:
+                self._batch_slots.release()
+                continue
+
+            task = asyncio.create_task(self._score(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+
+from src.inference import ModelInference
+from src.settings import DataSettings, LoggerSettings, env_settings
+from src.utils.logger import setup_logging
+
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+EVAL_QUESTIONS_PATH = "data/testing/eval_questions.json"
+
+
+def load_labeled_data(data_path=DataSettings().data_path):
+    """Loads all labeled CSV files into one dataframe with FinalLabel mapped to class ids"""
+    csv_files = sorted(file for file in os.listdir(data_path) if file.endswith(".csv"))
+    data = pd.concat(
+        (
+            pd.read_csv(os.path.join(data_path, file), encoding="utf-8-sig")
+            for file in csv_files
+        ),
+        ignore_index=True,
+    )
+    class_ids = {name: idx for idx, name in enumerate(DataSettings().class_names)}
+    data["FinalLabel"] = data["FinalLabel"].str.upper().map(class_ids).astype(int)
+    return data
+
+
+def load_eval_questions(path=EVAL_QUESTIONS_PATH):
+    """Loads the evaluation questions and their targets"""
+    with open(path) as file:
+        eval_data = json.load(file)
+    return eval_data["questions"], eval_data["targets"]
+
+
+def model_size_mb(model: torch.nn.Module) -> float:
+    """Returns the serialized size of the model weights in megabytes"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return round(buffer.getbuffer().nbytes / 1e6, 2)
+
+
+def evaluate_model(model, questions, targets, batch_size=None, latency_samples=50):
+    """Returns the predictions, accuracy, batch throughput and single-query latency of the model"""
+    questions = list(questions)
+
+    # warm up once so lazy initialization does not skew the timings
+    model.predict(questions[:1])
+
+    start = time.perf_counter()
+    results = model.predict(questions, batch_size=batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    predictions = [result["prediction_class"] for result in results]
+
+    latencies = []
+    for question in questions[:latency_samples]:
+        start = time.perf_counter()
+        model.predict(question)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "num_questions": len(questions),
+        "accuracy": round(
+            float(np.mean(np.array(predictions) == np.array(targets))), 4
+        ),
+        "batch_throughput_qps": round(len(questions) / batch_seconds, 2),
+        "single_latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 2),
+            "p95": round(float(np.percentile(latencies, 95)), 2),
+            "mean": round(float(np.mean(latencies)), 2),
+        },
+        "predictions": predictions,
+    }
+
+
+def compare_precisions(
+    precisions=("fp32", "int8"),
+    model_type=env_settings.MODEL_TYPE,
+    output_path=None,
+):
+    """
+    Compares accuracy, latency and model size of the classifier at the given precisions
+    on the evaluation questions and the labeled CSVs. Agreement is measured against the
+    predictions of the first precision.
+    """
+    labeled_data = load_labeled_data()
+    datasets = {
+        "eval_questions": load_eval_questions(),
+        "labeled_data": (
+            labeled_data["Question"].tolist(),
+            labeled_data["FinalLabel"].tolist(),
+        ),
+    }
+
+    report = {}
+    reference_predictions = {}
+    for precision in precisions:
+        logger.info(f"Benchmarking {model_type} model at {precision} precision")
+        model = ModelInference(model_type=model_type, precision=precision)
+        report[precision] = {
+            "device": str(model.device),
+            "model_size_mb": model_size_mb(model.bert_classifier),
+            "datasets": {},
+        }
+
+        for name, (questions, targets) in datasets.items():
+            metrics = evaluate_model(model, questions, targets)
+            predictions = metrics.pop("predictions")
+            reference = reference_predictions.setdefault(name, predictions)
+            metrics["agreement_with_" + precisions[0]] = round(
+                float(np.mean(np.array(predictions) == np.array(reference))), 4
+            )
+            report[precision]["datasets"][name] = metrics
+
+    logger.info(f"Precision comparison report: {json.dumps(report, indent=2)}")
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w") as file:
+            json.dump(report, file, indent=2)
+        logger.info(f"Report written to {output_path}")
+
+    return report
+
+
+async def stream_throughput(
+    url, questions, user=None, password=None, chunk_lines=256, output_path=None
+):
+    """
+    Streams the questions to the NDJSON prediction endpoint of a running API and measures the
+    end-to-end throughput and the time to the first prediction. The request body is generated
+    while it is uploaded, so the client does not buffer the payload either.
+    """
+    import aiohttp
+
+    async def body():
+        for start in range(0, len(questions), chunk_lines):
+            chunk = questions[start : start + chunk_lines]
+            yield "".join(json.dumps(question) + "\n" for question in chunk).encode()
+
+    auth = aiohttp.BasicAuth(user, password) if user else None
+    timeout = aiohttp.ClientTimeout(total=None)
+    results = errors = 0
+    first_result = None
+
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(auth=auth, timeout=timeout) as session:
+        async with session.post(
+            url, data=body(), headers={"Content-Type": "application/x-ndjson"}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.content:
+                if first_result is None:
+                    first_result = time.perf_counter() - start
+                results += 1
+                errors += "error" in json.loads(line)
+    seconds = time.perf_counter() - start
+
+    report = {
+        "url": url,
+        "num_questions": len(questions),
+        "num_results": results,
+        "num_errors": errors,
+        "seconds": round(seconds, 2),
+        "throughput_qps": round(results / seconds, 2),
+        "time_to_first_result_ms": (
+            round(first_result * 1000, 2) if first_result is not None else None
+        ),
+    }
+    logger.info(f"Stream throughput report: {json.dumps(report, indent=2)}")
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w") as file:
+            json.dump(report, file, indent=2)
+        logger.info(f"Report written to {output_path}")
+
+    return report
+
+
+if __name__ == "__main__":
+    setup_logging(
+        logger_name=LoggerSettings().logger_name,
+        log_file="ModelBenchmark.log",
+        log_level=LoggerSettings().log_level,
+    )
+
+    parser = argparse.ArgumentParser(description="Benchmarks for the BERT classifier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    precision_parser = subparsers.add_parser(
+        "precision", help="Compare accuracy and latency across model precisions"
+    )
+    precision_parser.add_argument("--precisions", nargs="+", default=["fp32", "int8"])
+    precision_parser.add_argument("--model-type", default=env_settings.MODEL_TYPE)
+    precision_parser.add_argument(
+        "--output", default="data/reports/quantization_report.json"
+    )
+
+    stream_parser = subparsers.add_parser(
+        "stream",
+        help="Measure the throughput of the streaming NDJSON prediction endpoint",
+    )
+    stream_parser.add_argument(
+        "--url", default="http://localhost:8080/api/predict/stream"
+    )
+    stream_parser.add_argument("--num-questions", type=int, default=10000)
+    stream_parser.add_argument("--chunk-lines", type=int, default=256)
+    stream_parser.add_argument(
+        "--user", default=getattr(env_settings, "AUTH_USER", None)
+    )
+    stream_parser.add_argument(
+        "--password", default=getattr(env_settings, "AUTH_PASSWORD", None)
+    )
+    stream_parser.add_argument("--output", default="data/reports/stream_report.json")
+
+    args = parser.parse_args()
+
+    if args.command == "precision":
+        compare_precisions(
+            precisions=args.precisions,
+            model_type=args.model_type,
+            output_path=args.output,
+        )
+    elif args.command == "stream":
+        # cycle through the labeled questions up to the requested volume
+        labeled_questions = load_labeled_data()["Question"].dropna().tolist()
+        questions = [
+            labeled_questions[i % len(labeled_questions)]
+            for i in range(args.num_questions)
+        ]
+        asyncio.run(
+            stream_throughput(
+                args.url,
+                questions,
+                user=args.user,
+                password=args.password,
+                chunk_lines=args.chunk_lines,
+                output_path=args.output,
+            )
+        )
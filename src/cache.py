@@ -0,0 +1,459 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from redis.exceptions import RedisError
+
+from src.settings import CacheSettings, LoggerSettings
+from src.utils.redis_connect import get_async_redis_client
+
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+
+def canonicalize_query(
+    user_query: str,
+    strip_trailing_punctuation: bool = CacheSettings().strip_trailing_punctuation,
+) -> str:
+    """
+    Normalizes a query the way the uncased tokenizer sees it: NFKC, lowercase and single spaces,
+    and optionally without trailing punctuation
+    """
+    query = " ".join(unicodedata.normalize("NFKC", user_query).lower().split())
+    if strip_trailing_punctuation:
+        while query and unicodedata.category(query[-1]).startswith("P"):
+            query = query[:-1].rstrip()
+    return query
+
+
+def deep_getsizeof(value) -> int:
+    """Approximates the resident size in bytes of a value and the containers and items it holds"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_getsizeof(k) + deep_getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(deep_getsizeof(item) for item in value)
+    return size
+
+
+class FrequencySketch:
+    """
+    Approximate access frequencies of recently seen keys.
+
+    Counts are kept per key and halved every `sample_size` accesses, dropping the keys that
+    reach zero, so the counts follow the recent popularity and the memory stays bounded.
+    """
+
+    def __init__(self, sample_size: int = 10000):
+        self.sample_size = sample_size
+        self._counts = {}
+        self._accesses = 0
+
+    def increment(self, key: str):
+        """Count one access of a key."""
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._accesses += 1
+        if self._accesses >= self.sample_size:
+            self._counts = {k: c // 2 for k, c in self._counts.items() if c > 1}
+            self._accesses = 0
+
+    def frequency(self, key: str) -> int:
+        """The recent access count of a key."""
+        return self._counts.get(key, 0)
+
+
+class MemoryBoundedCache:
+    """
+    In-process LRU cache with a time to live, sized by a byte budget.
+
+    Entries are weighed with `deep_getsizeof`, and the least recently used entries are evicted
+    while a new entry does not fit. A frequency-based admission policy protects hot keys: a new
+    key is only admitted if it has been requested at least as often as each entry it would evict,
+    so a burst of one-off queries cannot flush the popular ones.
+
+    Attributes:
+        max_bytes (int): The byte budget of the resident entries.
+        ttl (float): The time to live of the entries in seconds.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, timer=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timer = timer
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+        self._entries = OrderedDict()
+        self._sketch = FrequencySketch()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, count: bool = True):
+        """
+        Returns the live value of a key and marks it as recently used, or None.
+        With `count` False, the lookup is left out of the statistics, the recency and the
+        admission frequencies, for internal lookups such as the cache warm-up.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[3] <= self.timer():
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if not count:
+            return entry[0] if entry is not None else None
+
+        self._sketch.increment(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value) -> bool:
+        """
+        Store a value, evicting least recently used entries to stay within the byte budget.
+
+        Returns:
+            bool: Whether the value was admitted.
+        """
+        size = deep_getsizeof(key) + deep_getsizeof(value)
+        if size > self.max_bytes:
+            self.rejections += 1
+            return False
+
+        # pick the victims first, so a rejected value leaves the cache untouched
+        now = self.timer()
+        current = self._entries.get(key)
+        excess = self.resident_bytes - (current[1] if current else 0) + size
+        excess -= self.max_bytes
+        key_frequency = self._sketch.frequency(key)
+        victims = []
+        for victim, (_, victim_size, _, expires) in self._entries.items():
+            if excess <= 0:
+                break
+            if victim == key:
+                continue
+            if expires > now and key_frequency < self._sketch.frequency(victim):
+                self.rejections += 1
+                return False
+            victims.append((victim, expires <= now))
+            excess -= victim_size
+
+        if current is not None:
+            self._remove(key)
+        for victim, expired in victims:
+            if expired:
+                self.expirations += 1
+            else:
+                self.evictions += 1
+            self._remove(victim)
+
+        self._entries[key] = (value, size, now, now + self.ttl)
+        self.resident_bytes += size
+        return True
+
+    def clear(self):
+        """Drop all entries."""
+        self._entries.clear()
+        self.resident_bytes = 0
+
+    def _remove(self, key: str):
+        _, size, _, _ = self._entries.pop(key)
+        self.resident_bytes -= size
+
+    def stats(self) -> dict:
+        """Returns the hit ratio, evictions, resident bytes and key-age distribution of the cache."""
+        now = self.timer()
+        ages = np.array([now - entry[2] for entry in self._entries.values()])
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "resident_bytes": self.resident_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejected_admissions": self.rejections,
+            "key_age_seconds": (
+                {
+                    "p50": round(float(np.percentile(ages, 50)), 2),
+                    "p90": round(float(np.percentile(ages, 90)), 2),
+                    "p99": round(float(np.percentile(ages, 99)), 2),
+                    "max": round(float(ages.max()), 2),
+                }
+                if len(ages)
+                else None
+            ),
+        }
+
+
+class PredictionCache:
+    """
+    Two-tier cache for prediction results.
+
+    A small in-process, memory-bounded L1 sits in front of a Redis L2 that is shared by all
+    replicas. Lookups try L1 first, then L2, and an L2 hit is copied into L1. Writes go
+    to both tiers. Values are stored in Redis as JSON, so UUIDs come back as strings.
+    Keys are derived from the canonical form of the query and are namespaced by the model
+    version and the decision threshold, so a model swap never serves stale entries.
+    Redis errors are logged and treated as misses, so the API keeps serving from L1
+    and the model when Redis is unavailable.
+
+    Attributes:
+        redis (redis.asyncio.Redis): The L2 client, or None to run with L1 only.
+        namespace (str): The model version and threshold the cached predictions belong to.
+        l1_max_bytes (int): The byte budget of the in-process L1.
+        l1_ttl (int): The time to live of L1 entries in seconds.
+        l2_ttl (int): The time to live of L2 entries in seconds.
+        key_prefix (str): The prefix of the Redis keys, to keep them apart from other data.
+    """
+
+    def __init__(
+        self,
+        redis=None,
+        namespace: str = "",
+        l1_max_bytes: int = CacheSettings().l1_max_bytes,
+        l1_ttl: int = CacheSettings().l1_ttl,
+        l2_ttl: int = CacheSettings().l2_ttl,
+        key_prefix: str = CacheSettings().l2_key_prefix,
+    ):
+        self.redis = redis
+        self.namespace = namespace
+        self.l1 = MemoryBoundedCache(max_bytes=l1_max_bytes, ttl=l1_ttl)
+        self.l2_ttl = l2_ttl
+        self.key_prefix = key_prefix
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+
+    def key(self, user_query: str) -> str:
+        """Returns the cache key of a query: the namespace and a hash of the canonical query."""
+        digest = hashlib.sha256(canonicalize_query(user_query).encode("utf-8"))
+        return f"{self.namespace}:{digest.hexdigest()}"
+
+    async def get(self, key: str):
+        """
+        Look up a key in L1, then in L2.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            dict: The cached value, or None on a miss in both tiers.
+        """
+        value = self.l1.get(key)
+        if value is not None or self.redis is None:
+            return value
+
+        try:
+            raw = await self.redis.get(self.key_prefix + key)
+        except RedisError as ex:
+            self.l2_errors += 1
+            logger.warning(f"Redis lookup failed, falling back to L1 only: {ex}")
+            return None
+        if raw is None:
+            self.l2_misses += 1
+            return None
+
+        self.l2_hits += 1
+        value = json.loads(raw)
+        self.l1.set(key, value)
+        return value
+
+    async def get_many(self, keys: list, count: bool = True) -> list:
+        """
+        Look up many keys in L1, then the L1 misses in L2 with a single MGET.
+
+        Args:
+            keys (list[str]): The cache keys.
+            count (bool): Whether the lookups count in the hit and miss statistics and the
+                L1 admission frequencies, False for internal lookups such as the warm-up.
+
+        Returns:
+            list: The cached values in the order of the keys, None for misses in both tiers.
+        """
+        values = [self.l1.get(key, count=count) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if not missing or self.redis is None:
+            return values
+
+        try:
+            raws = await self.redis.mget([self.key_prefix + keys[i] for i in missing])
+        except RedisError as ex:
+            self.l2_errors += 1
+            logger.warning(f"Redis lookup failed, falling back to L1 only: {ex}")
+            return values
+
+        for i, raw in zip(missing, raws):
+            if raw is None:
+                self.l2_misses += count
+                continue
+            self.l2_hits += count
+            values[i] = json.loads(raw)
+            self.l1.set(keys[i], values[i])
+        return values
+
+    async def set(self, key: str, value: dict):
+        """
+        Store a value in L1 and L2.
+
+        Args:
+            key (str): The cache key.
+            value (dict): The JSON-serializable value, UUIDs and datetimes are stored as strings.
+        """
+        self.l1.set(key, value)
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.set(
+                self.key_prefix + key, json.dumps(value, default=str), ex=self.l2_ttl
+            )
+        except RedisError as ex:
+            self.l2_errors += 1
+            logger.warning(f"Redis write failed, value kept in L1 only: {ex}")
+
+    async def set_many(self, items: dict):
+        """
+        Store many values in L1, and in L2 with a single pipelined round trip.
+
+        Args:
+            items (dict): The JSON-serializable values by cache key.
+        """
+        for key, value in items.items():
+            self.l1.set(key, value)
+        if self.redis is None or not items:
+            return
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(
+                        self.key_prefix + key,
+                        json.dumps(value, default=str),
+                        ex=self.l2_ttl,
+                    )
+                await pipe.execute()
+        except RedisError as ex:
+            self.l2_errors += 1
+            logger.warning(f"Redis write failed, values kept in L1 only: {ex}")
+
+    def stats(self) -> dict:
+        """Returns the statistics of the L1 and the hit counts of the L2."""
+        return {
+            "l1": self.l1.stats(),
+            "l2": (
+                {
+                    "hits": self.l2_hits,
+                    "misses": self.l2_misses,
+                    "errors": self.l2_errors,
+                    "ttl": self.l2_ttl,
+                }
+                if self.redis is not None
+                else None
+            ),
+        }
+
+    async def close(self):
+        """Close the connections of the L2 client."""
+        if self.redis is not None:
+            await self.redis.aclose()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls.
+
+    The first caller for a key runs the call, and every concurrent caller with the same key
+    awaits the future of that first call instead of running its own. The key is released as
+    soon as the call finishes, so later callers go through the cache again. If the first
+    caller is cancelled, a waiting duplicate takes over and runs the call itself.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn):
+        """
+        Run `fn()` once for all concurrent callers of `key`.
+
+        Args:
+            key (str): The key identifying identical calls.
+            fn (Callable[[], Awaitable]): The coroutine function to run.
+
+        Returns:
+            tuple: The result of the call, and whether it was shared from another caller.
+        """
+        while key in self._calls:
+            future = self._calls[key]
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as ex:
+            future.set_exception(ex)
+            # the waiting duplicates retrieve the exception, the caller gets it raised here
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        """Returns the number of calls run, coalesced and currently in flight."""
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+
+def create_prediction_cache(model, l2_backend: str = CacheSettings().l2_backend):
+    """
+    Build the prediction cache for the predictions of the given model with the configured L2 backend:
+    "redis" for the shared server, "fakeredis" for an in-memory stand-in, "none" for L1 only.
+    """
+    if l2_backend == "none":
+        redis = None
+    elif l2_backend in ("redis", "fakeredis"):
+        redis = get_async_redis_client(fake=l2_backend == "fakeredis")
+    else:
+        raise ValueError(f"Unknown cache L2 backend {l2_backend}")
+
+    cache = PredictionCache(
+        redis=redis, namespace=f"{model.model_version}:{model.prob_thresh}"
+    )
+    logger.info(
+        f"Initializing prediction cache for {cache.namespace} with L1 of {cache.l1.max_bytes} bytes "
+        f"(TTL {cache.l1.ttl}s) and {l2_backend} L2 (TTL {cache.l2_ttl}s)"
+    )
+    return cache
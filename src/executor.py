@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from src.settings import ExecutorSettings, LoggerSettings
+
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when no slot is free for a new inference job."""
+
+
+class InferenceExecutor:
+    """
+    Runs blocking, CPU-heavy model calls on a dedicated, size-bounded thread pool
+    so the asyncio event loop stays free to accept connections and serve cache hits.
+
+    At most `max_workers` jobs run at once and at most `max_queue` more may wait for
+    a worker. Jobs submitted beyond that are rejected with `InferenceQueueFull`,
+    unless the caller asks to block until a slot frees up.
+
+    Attributes:
+        max_workers (int): The number of threads running model calls.
+        max_queue (int): The number of jobs allowed to wait for a free thread.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = ExecutorSettings().max_workers,
+        max_queue: int = ExecutorSettings().max_queue,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="inference"
+        )
+        self._slots = asyncio.Semaphore(max_workers + max_queue)
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def in_flight(self) -> int:
+        """The number of submitted jobs, running or waiting for a free worker thread."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of submitted jobs waiting for a free worker thread."""
+        return max(0, self._in_flight - self.max_workers)
+
+    async def run(self, fn, *args, block: bool = False):
+        """
+        Run `fn(*args)` on the thread pool and wait for its result.
+
+        Args:
+            fn (Callable): The blocking function to run.
+            *args: Positional arguments for `fn`.
+            block (bool): If True, wait for a free slot instead of failing fast.
+
+        Returns:
+            Any: The return value of `fn`.
+
+        Raises:
+            InferenceQueueFull: If the executor is saturated and `block` is False.
+        """
+        if not block and self._slots.locked():
+            self._rejected += 1
+            raise InferenceQueueFull(
+                f"Inference queue is full ({self.max_queue} jobs waiting)"
+            )
+
+        async with self._slots:
+            self._in_flight += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._pool, fn, *args
+                )
+            finally:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def stats(self) -> dict:
+        """Returns the current load of the executor."""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self):
+        """Wait for running jobs to finish and release the worker threads."""
+        logger.info("Shutting down inference executor")
+        self._pool.shutdown(wait=True, cancel_futures=True)
@@ -1,20 +1,31 @@
 import glob
+import hashlib
 import logging
 import os
+import time
 import warnings
+from functools import cached_property
+
 import numpy as np
 import torch
+from torch import nn
 
-from src.dataloader import create_data_loader
 from src.model import BertSentimentClassifier, BertSentimentClassifierAdvanced
-from src.pretrained_model import pretrained_model, tokenizer
+from src.model_artifact import (
+    ARTIFACT_EXTENSION,
+    load_artifact_tokenizer,
+    load_model_artifact,
+)
+from src.pretrained_model import get_pretrained_model, get_tokenizer
 from src.settings import (
     AzureblobSettings,
     LoggerSettings,
     ModelSettings,
     TokenizerSettings,
+    WarmupSettings,
     env_settings,
 )
+from src.utils.logger import log_duration
 from src.utils.model_helpers import get_device
 
 warnings.filterwarnings("ignore")
@@ -22,8 +33,8 @@ warnings.filterwarnings("ignore")
 logger = logging.getLogger(LoggerSettings().logger_name)
 
 
-def saved_model_path(model_path=AzureblobSettings().input_path):
-    file_paths = glob.glob(os.path.join(model_path, "*pt"))
+def saved_model_path(model_path=AzureblobSettings().input_path, extension="pt"):
+    file_paths = glob.glob(os.path.join(model_path, f"*{extension}"))
     model_path_dict = {}
 
     for path in file_paths:
@@ -35,19 +46,130 @@ def saved_model_path(model_path=AzureblobSettings().input_path):
     return model_path_dict
 
 
+def file_fingerprint(path):
+    """
+    Returns a short hash of the size and modification time of a weights file, plus the header
+    of a safetensors artifact, so retrained weights under the same name get a new version
+    without reading the tensors
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    stat = os.stat(path)
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    if path.endswith(ARTIFACT_EXTENSION):
+        # a safetensors file starts with the little-endian u64 length of its JSON header,
+        # which holds the tensor layout and the artifact metadata
+        with open(path, "rb") as file:
+            header_length = int.from_bytes(file.read(8), "little")
+            digest.update(file.read(header_length))
+    return digest.hexdigest()
+
+
 class ModelInference:
     def __init__(
         self,
-        tokenizer=tokenizer,
+        tokenizer=None,
         model_type=env_settings.MODEL_TYPE,
-        model=pretrained_model,
+        precision=env_settings.MODEL_PRECISION,
+        backend=env_settings.MODEL_BACKEND,
+        model=None,
+        use_artifact=True,
         max_len=TokenizerSettings().max_length,
+        padding=TokenizerSettings().padding,
+        batch_size=TokenizerSettings().batch_size,
         prob_thresh=ModelSettings().binary_thresh,
+        device=None,
     ):
-        self.device = get_device()
-        self.tokenizer = tokenizer
+        self.device = torch.device(device) if device is not None else get_device()
+        self.model_type = model_type
+
+        # a self-contained artifact, when present, replaces both the pretrained downloads and the .pt
+        artifact_path = None
+        if use_artifact and model is None:
+            artifact_path = saved_model_path(extension=ARTIFACT_EXTENSION).get(
+                model_type
+            )
+
+        with log_duration(logger, "tokenizer loading"):
+            if tokenizer is None and artifact_path is not None:
+                tokenizer = load_artifact_tokenizer(artifact_path)
+            self.tokenizer = tokenizer if tokenizer is not None else get_tokenizer()
         self.max_len = max_len
+        self.padding = padding
+        self.batch_size = batch_size
         self.prob_thresh = prob_thresh
+        self.precision = precision
+        self.backend = backend
+
+        # the file the active backend serves from, fingerprinted into the model version
+        if backend == "onnx":
+            self.weights_path = saved_model_path(extension="onnx").get(model_type)
+        else:
+            self.weights_path = artifact_path or saved_model_path(extension="pt").get(
+                model_type
+            )
+
+        # the word-piece embedding table, kept for cheap query embeddings (torch backend only)
+        self.token_embeddings = None
+
+        if backend == "onnx":
+            self.bert_classifier = None
+            with log_duration(logger, "ONNX session loading"):
+                self._load_onnx_session(model_type)
+        else:
+            if precision == "int8" and self.device.type != "cpu":
+                logger.info(
+                    "Dynamic int8 quantization runs on CPU only, switching device"
+                )
+                self.device = torch.device("cpu")
+
+            if artifact_path is not None:
+                logger.info(f"Loading {model_type} model artifact from {artifact_path}")
+                with log_duration(logger, "model artifact loading"):
+                    self.bert_classifier = load_model_artifact(
+                        artifact_path, device=self.device
+                    )
+            else:
+                if model is None:
+                    with log_duration(logger, "pretrained backbone loading"):
+                        model = get_pretrained_model()
+                with log_duration(logger, "classifier weights loading"):
+                    self._load_torch_model(model_type, model)
+
+            self.bert_classifier.eval()
+
+            if precision == "int8":
+                logger.info("Applying dynamic int8 quantization to the Linear layers")
+                # quantize in place and drop the cached fp32 backbone, so the fp32 Linear
+                # weights are released instead of kept next to their int8 copies
+                get_pretrained_model.cache_clear()
+                self.bert_classifier = torch.ao.quantization.quantize_dynamic(
+                    self.bert_classifier, {nn.Linear}, dtype=torch.qint8, inplace=True
+                )
+
+            self.token_embeddings = (
+                self.bert_classifier.bert.embeddings.word_embeddings.weight.detach()
+            )
+
+    @cached_property
+    def model_version(self):
+        """
+        Identifies the served model by type, backend, precision and a fingerprint of the weights
+        file, unless pinned with the MODEL_VERSION setting
+        """
+        if env_settings.MODEL_VERSION:
+            return env_settings.MODEL_VERSION
+
+        if self.weights_path is None:
+            logger.warning(
+                "No weights file to fingerprint, set MODEL_VERSION to tell retrained models apart"
+            )
+            fingerprint = "unversioned"
+        else:
+            fingerprint = file_fingerprint(self.weights_path)
+        return f"{self.model_type}-{self.backend}-{self.precision}-{fingerprint}"
+
+    def _load_torch_model(self, model_type, model):
+        """Builds the classifier around the pretrained backbone and loads the trained weights"""
         model_path_dict = saved_model_path()
 
         # model declaration and loading with pretrained weights
@@ -76,8 +198,111 @@ class ModelInference:
             )
             self.bert_classifier.to(self.device)
 
+    def _load_onnx_session(self, model_type):
+        """Opens the exported ONNX graph in an ONNX Runtime CPU session with all graph optimizations"""
+        import onnxruntime as ort
+
+        onnx_path = saved_model_path(extension="onnx")[model_type]
+        logger.info(f"Loading {model_type} ONNX model from {onnx_path}")
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = (
+            ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        self.device = torch.device("cpu")
+        self.onnx_session = ort.InferenceSession(
+            onnx_path,
+            sess_options=session_options,
+            providers=["CPUExecutionProvider"],
+        )
+
+    def compile(self, mode):
+        """Replaces the classifier with a TorchScript-traced ("trace") or torch.compile'd ("compile") version"""
+        if mode == "none":
+            return
+        if self.backend != "torch":
+            logger.info(f"Skipping {mode} as it only applies to the torch backend")
+            return
+
+        if mode == "trace":
+            logger.info("Tracing the classifier with TorchScript")
+            encoding = self._encode(
+                ["sample question used to trace the classifier"] * 2
+            )
+            input_ids, attention_mask = self._pad(encoding, range(2))
+            with torch.no_grad():
+                traced = torch.jit.trace(
+                    self.bert_classifier,
+                    (input_ids.to(self.device), attention_mask.to(self.device)),
+                    strict=False,
+                )
+            self.bert_classifier = torch.jit.freeze(traced)
+
+        elif mode == "compile":
+            logger.info("Compiling the classifier with torch.compile")
+            self.bert_classifier = torch.compile(self.bert_classifier, dynamic=True)
+
+        else:
+            raise ValueError(f"Unknown compile mode: {mode}")
+
+    def warmup(
+        self,
+        batch_sizes=WarmupSettings().batch_sizes,
+        seq_lens=WarmupSettings().seq_lens,
+    ):
+        """
+        Runs dummy forward passes over representative batch and sequence shapes, so lazy
+        initialization, compilation and allocator growth happen before the first request
+        """
+        for batch_size in batch_sizes:
+            for seq_len in seq_lens:
+                seq_len = min(seq_len, self.max_len)
+                input_ids = torch.full(
+                    (batch_size, seq_len), self.tokenizer.unk_token_id, dtype=torch.long
+                )
+                input_ids[:, 0] = self.tokenizer.cls_token_id
+                input_ids[:, -1] = self.tokenizer.sep_token_id
+                attention_mask = torch.ones_like(input_ids)
+
+                start = time.perf_counter()
+                self._predict_tensors(input_ids, attention_mask)
+                logger.info(
+                    f"Warmup forward for batch size {batch_size} and sequence length {seq_len} "
+                    f"took {(time.perf_counter() - start) * 1000:.1f} ms"
+                )
+
+    def embed_queries(self, texts):
+        """
+        Returns L2-normalized cheap embeddings of the texts: the mean of their word-piece embeddings,
+        computed without running the encoder
+        """
+        encoding = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            max_length=self.max_len,
+            truncation=True,
+            return_token_type_ids=False,
+            return_attention_mask=False,
+        )
+        embeddings = np.zeros(
+            (len(texts), self.token_embeddings.shape[1]), dtype=np.float32
+        )
+        with torch.inference_mode():
+            for i, input_ids in enumerate(encoding["input_ids"]):
+                if input_ids:
+                    embeddings[i] = (
+                        self.token_embeddings[input_ids]
+                        .float()
+                        .mean(dim=0)
+                        .cpu()
+                        .numpy()
+                    )
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
     def _get_predictions(self, data_loader, model):
-        """Returns only the predicted labels for the given data loader"""
+        """Returns only the predicted labels for the given data loader, meant for large offline jobs"""
 
         review_texts = []
         predictions = []
@@ -111,22 +336,102 @@ class ModelInference:
 
         return review_texts, predictions, prediction_probs
 
-    def predict(self, user_query):
-        """Returns the predicted labels for the given data loader"""
-
-        logger.info(f"Predicting labels for query: {user_query}")
-        query_loader = create_data_loader(
-            question=[user_query] if isinstance(user_query, str) else user_query,
-            targets=None,
-            max_len=self.max_len,
-            batch_size=1,
-            shuffle=False,
-            tokenizer=tokenizer,
+    def _encode(self, texts):
+        """Tokenizes the whole list of texts in one call to the fast tokenizer, without padding"""
+        return self.tokenizer(
+            texts,
+            add_special_tokens=True,
+            max_length=self.max_len,
+            return_token_type_ids=False,
+            return_attention_mask=True,
+            truncation=True,
         )
-        review_texts, predictions, prediction_probs = self._get_predictions(
-            data_loader=query_loader,
-            model=self.bert_classifier,
+
+    def _pad(self, encoding, indices):
+        """
+        Pads the selected encoded texts only up to the longest one among them,
+        unless padding is set to "max_length"
+        """
+        batch = self.tokenizer.pad(
+            {
+                "input_ids": [encoding["input_ids"][i] for i in indices],
+                "attention_mask": [encoding["attention_mask"][i] for i in indices],
+            },
+            padding=self.padding,
+            max_length=self.max_len,
+            return_tensors="pt",
+        )
+        return batch["input_ids"], batch["attention_mask"]
+
+    def _length_buckets(self, encoding, batch_size):
+        """Groups text indices into batches of similar token length, so each batch pads little"""
+        order = sorted(
+            range(len(encoding["input_ids"])),
+            key=lambda i: len(encoding["input_ids"][i]),
+        )
+        return [
+            order[start : start + batch_size]
+            for start in range(0, len(order), batch_size)
+        ]
+
+    def _forward(self, input_ids, attention_mask):
+        """Returns the flattened logits of the configured backend for a batch of encoded texts"""
+        if self.backend == "onnx":
+            outputs = self.onnx_session.run(
+                ["logits"],
+                {
+                    "input_ids": input_ids.numpy(),
+                    "attention_mask": attention_mask.numpy(),
+                },
+            )[0]
+            return torch.from_numpy(outputs).flatten()
+
+        return self.bert_classifier(
+            input_ids=input_ids.to(self.device),
+            attention_mask=attention_mask.to(self.device),
+        ).flatten()
+
+    def _predict_tensors(self, input_ids, attention_mask):
+        """Returns the predicted labels and probabilities for a batch of encoded texts"""
+        with torch.inference_mode():
+            outputs = self._forward(input_ids, attention_mask)
+
+            probs = torch.sigmoid(outputs)
+            preds = (probs > self.prob_thresh).float()
+
+        return preds.cpu().numpy(), np.round(probs.cpu().numpy(), 3)
+
+    def predict(self, user_query, batch_size=None):
+        """
+        Returns the predicted labels for the given query or list of queries.
+        Lists are sorted into length buckets of `batch_size` queries, each padded on its own,
+        and the results are returned in the original order.
+        """
+
+        review_texts = [
+            str(query)
+            for query in ([user_query] if isinstance(user_query, str) else user_query)
+        ]
+
+        encoding = self._encode(review_texts)
+        predictions = [None] * len(review_texts)
+        prediction_probs = [None] * len(review_texts)
+
+        buckets = self._length_buckets(encoding, batch_size or self.batch_size)
+        # queries are user content, keep them out of the INFO log
+        logger.info(
+            f"Predicting labels for {len(review_texts)} queries in buckets of "
+            f"{[len(indices) for indices in buckets]}"
         )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Predicting labels for queries: {review_texts}")
+
+        for indices in buckets:
+            input_ids, attention_mask = self._pad(encoding, indices)
+            preds, probs = self._predict_tensors(input_ids, attention_mask)
+            for i, pred, prob in zip(indices, preds.tolist(), probs.tolist()):
+                predictions[i] = pred
+                prediction_probs[i] = prob
 
         if isinstance(user_query, str):
             return dict(
@@ -139,9 +444,9 @@ class ModelInference:
                     ],
                     [
                         review_texts[0],
-                        int(predictions.tolist()[0]),
-                        prediction_probs.tolist()[0],
-                        "SIMPLE" if predictions.tolist()[0] == 0 else "COMPLEX",
+                        int(predictions[0]),
+                        prediction_probs[0],
+                        "SIMPLE" if predictions[0] == 0 else "COMPLEX",
                     ],
                 )
             )
@@ -152,14 +457,14 @@ class ModelInference:
                         [
                             "user_query",
                             "prediction_class",
-                            "prediction_prob",
+                            "prediction_probability",
                             "prediction_label",
                         ],
                         [
                             review_texts[i],
-                            int(predictions.tolist()[i]),
-                            prediction_probs.tolist()[i],
-                            "SIMPLE" if predictions.tolist()[i] == 0 else "COMPLEX",
+                            int(predictions[i]),
+                            prediction_probs[i],
+                            "SIMPLE" if predictions[i] == 0 else "COMPLEX",
                         ],
                     )
                 )
@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import os
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import load_file, save_file
+from tokenizers import Tokenizer
+from transformers import BertConfig, BertModel, BertTokenizerFast
+from transformers.modeling_utils import no_init_weights
+
+from src.model import BertSentimentClassifier, BertSentimentClassifierAdvanced
+from src.settings import AzureblobSettings, LoggerSettings, env_settings
+from src.utils.logger import setup_logging
+
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+ARTIFACT_FORMAT = "bert-classifier/1"
+ARTIFACT_EXTENSION = ".safetensors"
+
+
+def artifact_path_for(checkpoint_path):
+    """Returns the artifact path that sits next to a .pt checkpoint"""
+    return os.path.splitext(checkpoint_path)[0] + ARTIFACT_EXTENSION
+
+
+def save_model_artifact(model, tokenizer, path):
+    """
+    Writes the classifier config, the fast tokenizer and the fine-tuned weights into a single
+    safetensors file. Config and tokenizer travel in the header metadata, the weights as tensors.
+    """
+    advanced = isinstance(model, BertSentimentClassifierAdvanced)
+    tokenizer_config = {
+        "do_lower_case": tokenizer.do_lower_case,
+        "model_max_length": tokenizer.model_max_length,
+        **tokenizer.special_tokens_map,
+    }
+    metadata = {
+        "format": ARTIFACT_FORMAT,
+        "model_type": "advanced" if advanced else "base",
+        "n_classes": str(model.classifier.out_features),
+        "dropout": str(model.drop.p),
+        "bert_config": model.bert.config.to_json_string(),
+        "tokenizer": tokenizer.backend_tokenizer.to_str(),
+        "tokenizer_config": json.dumps(tokenizer_config),
+    }
+    if advanced:
+        metadata["fc_hidden"] = str(model.pooler.out_features)
+
+    state_dict = {
+        name: tensor.detach().cpu().contiguous()
+        for name, tensor in model.state_dict().items()
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    save_file(state_dict, path, metadata=metadata)
+    logger.info(f"Model artifact written to {path}")
+    return path
+
+
+def read_artifact_metadata(path):
+    """Reads the header metadata of an artifact without touching the weights"""
+    with safe_open(path, framework="pt") as artifact:
+        metadata = artifact.metadata()
+
+    if metadata is None or metadata.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"{path} is not a {ARTIFACT_FORMAT} model artifact")
+    return metadata
+
+
+def load_artifact_tokenizer(path):
+    """Rebuilds the fast tokenizer stored in an artifact"""
+    metadata = read_artifact_metadata(path)
+    return BertTokenizerFast(
+        tokenizer_object=Tokenizer.from_str(metadata["tokenizer"]),
+        **json.loads(metadata["tokenizer_config"]),
+    )
+
+
+def load_model_artifact(path, device=torch.device("cpu")):
+    """
+    Builds the classifier described by an artifact and binds it to the memory-mapped weights.
+
+    The modules are created on the meta device, without any storage, and the tensors read from
+    the file are assigned in place of the empty parameters, so the weights only exist once.
+    """
+    metadata = read_artifact_metadata(path)
+    config = BertConfig.from_dict(json.loads(metadata["bert_config"]))
+
+    with torch.device("meta"), no_init_weights():
+        bert = BertModel(config)
+        if metadata["model_type"] == "advanced":
+            model = BertSentimentClassifierAdvanced(
+                bert=bert,
+                n_classes=int(metadata["n_classes"]),
+                fc_hidden=int(metadata["fc_hidden"]),
+                dropout=float(metadata["dropout"]),
+            )
+        else:
+            model = BertSentimentClassifier(
+                bert=bert,
+                n_classes=int(metadata["n_classes"]),
+                dropout=float(metadata["dropout"]),
+            )
+
+    model.load_state_dict(load_file(path, device=str(device)), assign=True)
+    _materialize_buffers(model, config, device)
+    return model.to(device)
+
+
+def _materialize_buffers(model, config, device):
+    """
+    Rebuilds the non-persistent buffers of the embeddings, which are not stored in the artifact
+    and are left on the meta device by the loading.
+    """
+    embeddings = model.bert.embeddings
+    position_ids = torch.arange(config.max_position_embeddings, device=device)
+    embeddings.position_ids = position_ids.expand((1, -1))
+    embeddings.token_type_ids = torch.zeros(
+        embeddings.position_ids.size(), dtype=torch.long, device=device
+    )
+
+    left_on_meta = [
+        name
+        for name, tensor in [*model.named_parameters(), *model.named_buffers()]
+        if tensor.is_meta
+    ]
+    if left_on_meta:
+        raise ValueError(f"Artifact has no values for {', '.join(left_on_meta)}")
+
+
+if __name__ == "__main__":
+    setup_logging(
+        logger_name=LoggerSettings().logger_name,
+        log_file="ModelArtifact.log",
+        log_level=LoggerSettings().log_level,
+    )
+
+    from src.inference import ModelInference, saved_model_path
+
+    parser = argparse.ArgumentParser(
+        description="Convert trained .pt checkpoints into self-contained model artifacts"
+    )
+    parser.add_argument("--model-types", nargs="+", default=[env_settings.MODEL_TYPE])
+    parser.add_argument("--model-path", default=AzureblobSettings().input_path)
+    args = parser.parse_args()
+
+    for model_type in args.model_types:
+        checkpoint_path = saved_model_path(args.model_path)[model_type]
+        model = ModelInference(
+            model_type=model_type,
+            precision="fp32",
+            backend="torch",
+            use_artifact=False,
+        )
+        save_model_artifact(
+            model.bert_classifier, model.tokenizer, artifact_path_for(checkpoint_path)
+        )
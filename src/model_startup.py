@@ -7,6 +7,7 @@ import logging
 from src.utils.azure_connector import AzureBlobConnection
 import os
 from src.inference import ModelInference
+from src.utils.logger import log_duration
 
 logger = logging.getLogger(LoggerSettings().logger_name)
 
@@ -15,23 +16,34 @@ def model_startup(
     env_settings=env_settings,
     AzureblobSettings=AzureblobSettings,
     ModelInference=ModelInference,
+    compile_mode=env_settings.MODEL_COMPILE,
+    device=None,
 ):
     logger.info("Downloading model from Azure Blob Storage")
-    az_connection = AzureBlobConnection(
-        storage_account=env_settings.STORAGE_ACCOUNT,
-        client_id=env_settings.CLIENT_ID,
-        tenant_id=env_settings.TENANT_ID,
-        client_secret=env_settings.SECRET_ID,
-    )
+    with log_duration(logger, "model download"):
+        az_connection = AzureBlobConnection(
+            storage_account=env_settings.STORAGE_ACCOUNT,
+            client_id=env_settings.CLIENT_ID,
+            tenant_id=env_settings.TENANT_ID,
+            client_secret=env_settings.SECRET_ID,
+        )
+
+        az_connection.azblob_download(
+            container_name=env_settings.CONTAINER_NAME,
+            root_path=os.getcwd(),
+            local_output_path=AzureblobSettings().input_path,
+            blob_path=AzureblobSettings().blob_path,
+            file_names=[],
+        )
 
-    az_connection.azblob_download(
-        container_name=env_settings.CONTAINER_NAME,
-        root_path=os.getcwd(),
-        local_output_path=AzureblobSettings().input_path,
-        blob_path=AzureblobSettings().blob_path,
-        file_names=[],
-    )
     logger.info("Initializing model inference")
-    infer_model = ModelInference()
+    with log_duration(logger, "model inference initialization"):
+        infer_model = ModelInference(device=device)
+    logger.info(f"Serving model version {infer_model.model_version}")
+
+    if compile_mode != "none":
+        logger.info(f"Optimizing model inference with mode: {compile_mode}")
+        with log_duration(logger, f"model {compile_mode}"):
+            infer_model.compile(compile_mode)
 
     return infer_model
@@ -0,0 +1,128 @@
+import argparse
+import inspect
+import logging
+import os
+import sys
+
+import numpy as np
+import torch
+
+from src.benchmark import load_eval_questions
+from src.inference import ModelInference, saved_model_path
+from src.settings import LoggerSettings, env_settings
+from src.utils.logger import setup_logging
+
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+
+def export_classifier(
+    classifier, input_ids, attention_mask, onnx_path, opset_version=17
+):
+    """
+    Traces a classifier on a sample batch into an ONNX graph with dynamic batch and
+    sequence axes, taking `input_ids` and `attention_mask` and returning the `logits`.
+    """
+    export_kwargs = {}
+    # newer torch exports through dynamo by default, keep the TorchScript exporter
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+
+    torch.onnx.export(
+        classifier,
+        (input_ids, attention_mask),
+        onnx_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=opset_version,
+        **export_kwargs,
+    )
+    return onnx_path
+
+
+def export_onnx(model_type=env_settings.MODEL_TYPE, opset_version=17):
+    """
+    Exports the trained checkpoint of the given model type to an ONNX graph next to it,
+    with dynamic batch and sequence axes.
+    """
+    checkpoint_path = saved_model_path()[model_type]
+    onnx_path = os.path.splitext(checkpoint_path)[0] + ".onnx"
+
+    model = ModelInference(model_type=model_type, precision="fp32", backend="torch")
+    classifier = model.bert_classifier.cpu()
+
+    encoding = model.tokenizer(
+        ["sample question used to trace the graph"],
+        return_token_type_ids=False,
+        return_tensors="pt",
+    )
+
+    logger.info(f"Exporting {checkpoint_path} to {onnx_path}")
+    export_classifier(
+        classifier,
+        encoding["input_ids"],
+        encoding["attention_mask"],
+        onnx_path,
+        opset_version=opset_version,
+    )
+    return onnx_path
+
+
+def verify_parity(model_type=env_settings.MODEL_TYPE, questions=None, atol=1e-4):
+    """
+    Compares the logits of the ONNX Runtime backend against the PyTorch model on the
+    evaluation questions and returns the maximum absolute difference.
+    """
+    if questions is None:
+        questions, _ = load_eval_questions()
+
+    torch_model = ModelInference(
+        model_type=model_type, precision="fp32", backend="torch"
+    )
+    onnx_model = ModelInference(model_type=model_type, precision="fp32", backend="onnx")
+
+    # encode once so both backends see exactly the same padded batch
+    encoding = torch_model._encode(questions)
+    input_ids, attention_mask = torch_model._pad(encoding, range(len(questions)))
+
+    with torch.inference_mode():
+        torch_logits = torch_model._forward(input_ids, attention_mask).cpu().numpy()
+        onnx_logits = onnx_model._forward(input_ids, attention_mask).numpy()
+
+    max_abs_diff = float(np.max(np.abs(torch_logits - onnx_logits)))
+    logger.info(
+        f"ONNX parity on {len(questions)} questions: max abs logit difference {max_abs_diff:.2e}"
+    )
+    return {"max_abs_diff": max_abs_diff, "within_tolerance": max_abs_diff <= atol}
+
+
+if __name__ == "__main__":
+    setup_logging(
+        logger_name=LoggerSettings().logger_name,
+        log_file="OnnxExport.log",
+        log_level=LoggerSettings().log_level,
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Export trained checkpoints to ONNX and check parity with PyTorch"
+    )
+    parser.add_argument("--model-types", nargs="+", default=[env_settings.MODEL_TYPE])
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--skip-verify", action="store_true")
+    args = parser.parse_args()
+
+    failed = False
+    for model_type in args.model_types:
+        export_onnx(model_type=model_type, opset_version=args.opset)
+        if not args.skip_verify:
+            parity = verify_parity(model_type=model_type, atol=args.atol)
+            if not parity["within_tolerance"]:
+                logger.error(f"ONNX parity check failed for {model_type}: {parity}")
+                failed = True
+
+    sys.exit(1 if failed else 0)
@@ -1,6 +1,28 @@
-from transformers import BertModel, BertTokenizer
+from functools import lru_cache
 
 from src.settings import ModelSettings, TokenizerSettings
 
-tokenizer = BertTokenizer.from_pretrained(TokenizerSettings().pretrained_model_name)
-pretrained_model = BertModel.from_pretrained(ModelSettings().pretrained_model_name)
+
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    """Loads the pretrained tokenizer on first use"""
+    from transformers import BertTokenizerFast
+
+    return BertTokenizerFast.from_pretrained(TokenizerSettings().pretrained_model_name)
+
+
+@lru_cache(maxsize=None)
+def get_pretrained_model():
+    """Loads the pretrained BERT backbone on first use"""
+    from transformers import BertModel
+
+    return BertModel.from_pretrained(ModelSettings().pretrained_model_name)
+
+
+def __getattr__(name):
+    """Keeps `from src.pretrained_model import tokenizer, pretrained_model` working, loading on first access"""
+    if name == "tokenizer":
+        return get_tokenizer()
+    if name == "pretrained_model":
+        return get_pretrained_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
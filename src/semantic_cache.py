@@ -0,0 +1,156 @@
+import logging
+import random
+import threading
+
+import numpy as np
+
+from src.settings import LoggerSettings, SemanticCacheSettings
+
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+
+class SemanticCache:
+    """
+    Near-duplicate cache that reuses the prediction of a previously answered paraphrase.
+
+    Each answered query is stored with its cheap embedding (`ModelInference.embed_queries`,
+    the mean of its word-piece embeddings) in a bounded in-memory index. A new query whose
+    embedding lies within `max_distance` cosine distance of a stored one reuses the stored
+    prediction. The index is an exact search over a fixed-size matrix of unit vectors, a
+    single matrix-vector product per lookup, and the oldest entries are overwritten once
+    `capacity` is reached. Lookups run on the inference executor while answered queries are
+    added from the event loop, so a lock keeps a lookup from reading a half-written entry.
+
+    A `shadow_rate` fraction of the hits is also scored by the full classifier, so the
+    agreement between reused and fresh predictions can be tracked while tuning the radius.
+
+    Attributes:
+        model (ModelInference): The loaded model providing the cheap embeddings.
+        max_distance (float): The maximum cosine distance for a stored query to be reused.
+        capacity (int): The maximum number of stored queries.
+        shadow_rate (float): The fraction of hits checked against the full classifier.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_distance: float = SemanticCacheSettings().semantic_max_distance,
+        capacity: int = SemanticCacheSettings().semantic_capacity,
+        shadow_rate: float = SemanticCacheSettings().semantic_shadow_rate,
+    ):
+        self.model = model
+        self.max_distance = max_distance
+        self.capacity = capacity
+        self.shadow_rate = shadow_rate
+        self._vectors = np.zeros(
+            (capacity, model.token_embeddings.shape[1]), dtype=np.float32
+        )
+        self._records = [None] * capacity
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.shadow_checks = 0
+        self.shadow_agreements = 0
+
+    def embed(self, user_query: str) -> np.ndarray:
+        """Returns the cheap unit-length embedding of a query."""
+        return self.model.embed_queries([user_query])[0]
+
+    def embed_many(self, user_queries: list) -> np.ndarray:
+        """Returns the cheap unit-length embeddings of many queries, one row per query."""
+        return self.model.embed_queries(user_queries)
+
+    def match(self, user_query: str) -> tuple:
+        """
+        Embed a query and find the nearest stored query, in one call to run on the executor.
+
+        Returns:
+            tuple: The embedding of the query, and the stored prediction of the nearest
+            query within `max_distance` or None.
+        """
+        embedding = self.embed(user_query)
+        return embedding, self.lookup(embedding)
+
+    def lookup(self, embedding: np.ndarray):
+        """
+        Find the nearest stored query.
+
+        Args:
+            embedding (np.ndarray): The unit-length embedding of the new query.
+
+        Returns:
+            dict: The stored prediction of the nearest query within `max_distance`, or None.
+        """
+        with self._lock:
+            self.lookups += 1
+            if self._size == 0:
+                return None
+
+            similarities = self._vectors[: self._size] @ embedding
+            nearest = int(np.argmax(similarities))
+            if 1.0 - similarities[nearest] > self.max_distance:
+                return None
+
+            self.hits += 1
+            return self._records[nearest]
+
+    def add(self, embedding: np.ndarray, record: dict):
+        """Store the prediction of an answered query, overwriting the oldest entry when full."""
+        with self._lock:
+            self._vectors[self._next] = embedding
+            self._records[self._next] = record
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def should_shadow(self) -> bool:
+        """Whether the current hit should also be scored by the full classifier."""
+        return random.random() < self.shadow_rate
+
+    def record_shadow(self, reused_label: str, fresh_label: str):
+        """Count a shadow check of a reused prediction against the full classifier."""
+        self.shadow_checks += 1
+        if reused_label == fresh_label:
+            self.shadow_agreements += 1
+        else:
+            logger.info(
+                f"Semantic cache disagreement: reused {reused_label}, classifier {fresh_label}"
+            )
+
+    def stats(self) -> dict:
+        """Returns the size, hit rate and shadow agreement of the cache."""
+        return {
+            "size": self._size,
+            "capacity": self.capacity,
+            "max_distance": self.max_distance,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+            "shadow_checks": self.shadow_checks,
+            "agreement_rate": (
+                round(self.shadow_agreements / self.shadow_checks, 4)
+                if self.shadow_checks
+                else None
+            ),
+        }
+
+
+def create_semantic_cache(
+    model, enabled: bool = SemanticCacheSettings().semantic_cache_enabled
+):
+    """Build the semantic cache when enabled and supported by the model backend, otherwise None"""
+    if not enabled:
+        return None
+    if model.token_embeddings is None:
+        logger.warning(
+            f"Semantic cache needs the torch backend, disabled for {model.backend}"
+        )
+        return None
+
+    cache = SemanticCache(model)
+    logger.info(
+        f"Initializing semantic cache of {cache.capacity} entries "
+        f"with max cosine distance {cache.max_distance}"
+    )
+    return cache
@@ -1,5 +1,6 @@
 import logging
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import warnings
 
@@ -14,6 +15,19 @@ class Settings(BaseSettings):
         extra="allow",
     )
 
+    # serving options selectable next to MODEL_TYPE, with defaults when absent from the env file
+    MODEL_PRECISION: str = "fp32"
+    MODEL_BACKEND: str = "torch"
+    MODEL_COMPILE: str = "none"
+    MODEL_PRELOAD: bool = False
+    MODEL_VERSION: Optional[str] = None
+    DB_RESET_ON_STARTUP: bool = True
+    DB_ECHO: bool = False
+    REDIS_HOST: str = "localhost"
+    REDIS_PORT: int = 6379
+    REDIS_DB: str = "0"
+    REDIS_PASSWORD: Optional[str] = None
+
 
 env_settings = Settings(_env_file="dev.env", _env_file_encoding="utf-8", extra="allow")
 
@@ -38,10 +52,88 @@ class DataSettings(BaseSettings):
 class TokenizerSettings(BaseSettings):
     pretrained_model_name: str = "bert-base-uncased"
     max_length: int = 128
+    padding: str = "longest"
     batch_size: int = 16
     num_workers: int = 4
 
 
+class BatcherSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="BATCHER_")
+
+    max_batch_size: int = 16
+    max_wait_ms: float = 5.0
+    max_queue: int = 256
+    max_request_queries: int = 256
+
+
+class ExecutorSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="EXECUTOR_")
+
+    max_workers: int = 1
+    max_queue: int = 64
+
+
+class WarmupSettings(BaseSettings):
+    batch_sizes: list = [1, 4, 16]
+    seq_lens: list = [16, 32, 64]
+
+
+class CacheSettings(BaseSettings):
+    l1_max_bytes: int = 16 * 1024 * 1024
+    l1_ttl: int = 60
+    l2_backend: str = "redis"
+    l2_ttl: int = 3600
+    l2_key_prefix: str = "prediction:"
+    strip_trailing_punctuation: bool = True
+
+
+class StreamSettings(BaseSettings):
+    stream_batch_size: int = 64
+    stream_max_line_bytes: int = 65536
+
+
+class JobSettings(BaseSettings):
+    jobs_dir: str = "data/jobs"
+    job_batch_size: int = 64
+    job_workers: int = 1
+    job_max_pending: int = 16
+    job_max_upload_bytes: int = 100 * 1024 * 1024
+    job_lease_seconds: int = 300
+    job_retention_hours: int = 24
+
+
+class ScoringWorkerSettings(BaseSettings):
+    scoring_stream: str = "prediction:requests"
+    scoring_group: str = "scorers"
+    scoring_read_count: int = 16
+    scoring_block_ms: int = 1000
+    scoring_claim_idle_ms: int = 60000
+    scoring_max_deliveries: int = 3
+    scoring_result_ttl: int = 86400
+    scoring_max_batch_queries: int = 64
+
+
+class WriteBehindSettings(BaseSettings):
+    persist_mode: str = "write_behind"
+    persist_max_batch: int = 256
+    persist_flush_interval_ms: float = 200.0
+    persist_max_queue: int = 10000
+    persist_max_retries: int = 3
+
+
+class CacheWarmupSettings(BaseSettings):
+    cache_warmup_enabled: bool = True
+    cache_warmup_top_queries: int = 1000
+    cache_warmup_batch_size: int = 64
+
+
+class SemanticCacheSettings(BaseSettings):
+    semantic_cache_enabled: bool = False
+    semantic_max_distance: float = 0.05
+    semantic_capacity: int = 10000
+    semantic_shadow_rate: float = 0.1
+
+
 class AzureblobSettings(BaseSettings):
     blob_path: str = "classifier_model/"
     input_path: str = "models/"
@@ -0,0 +1,384 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import time
+import uuid
+
+import redis
+
+from src.settings import LoggerSettings, ScoringWorkerSettings
+from src.utils.logger import setup_logging
+from src.utils.redis_connect import get_redis_client
+
+logger = logging.getLogger(LoggerSettings().logger_name)
+
+
+def result_key(stream: str, batch_id: str) -> str:
+    """Returns the key holding the predictions of a scored batch."""
+    return f"{stream}:result:{batch_id}"
+
+
+def dead_letter_stream(stream: str) -> str:
+    """Returns the stream receiving the batches that failed too many deliveries."""
+    return f"{stream}:dead"
+
+
+def _field(fields: dict, name: str):
+    """Returns a field of a stream entry, read with or without decode_responses."""
+    value = fields.get(name.encode(), fields.get(name))
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def enqueue_queries(
+    client: redis.Redis,
+    queries: list,
+    stream: str = ScoringWorkerSettings().scoring_stream,
+    max_batch_queries: int = ScoringWorkerSettings().scoring_max_batch_queries,
+) -> list:
+    """
+    Split queries into batches and append them to the work stream in one round trip.
+
+    Args:
+        client (redis.Redis): The redis client.
+        queries (list): The queries to score.
+        stream (str): The work stream consumed by the scoring workers.
+        max_batch_queries (int): The maximum number of queries per stream entry.
+
+    Returns:
+        list: The batch ids, used to fetch the predictions with `get_results`.
+    """
+    batch_ids = []
+    pipe = client.pipeline(transaction=False)
+    for start in range(0, len(queries), max_batch_queries):
+        batch_id = str(uuid.uuid4())
+        batch = [str(query) for query in queries[start : start + max_batch_queries]]
+        pipe.xadd(stream, {"batch_id": batch_id, "queries": json.dumps(batch)})
+        batch_ids.append(batch_id)
+    pipe.execute()
+    return batch_ids
+
+
+def get_results(
+    client: redis.Redis,
+    batch_ids: list,
+    stream: str = ScoringWorkerSettings().scoring_stream,
+) -> list:
+    """
+    Fetch the predictions of scored batches in one round trip.
+
+    Returns:
+        list: The result of each batch, or None for a batch not scored yet.
+    """
+    if not batch_ids:
+        return []
+    values = client.mget([result_key(stream, batch_id) for batch_id in batch_ids])
+    return [json.loads(value) if value is not None else None for value in values]
+
+
+class ScoringWorker:
+    """
+    Stateless scoring worker consuming batches of questions from a Redis Stream.
+
+    Workers of the same consumer group share the stream, each entry being delivered to
+    one of them, so scoring scales out by starting more workers on any host. The
+    entries of one read are scored together in a single call to `ModelInference.predict`.
+    The predictions of each batch are stored under `result_key` and the entry is
+    acknowledged in the same transaction.
+
+    An entry that fails, or whose worker dies before acknowledging it, stays pending in
+    the group and is claimed again by a live worker once idle for `claim_idle_ms`. An
+    entry delivered more than `max_deliveries` times is moved to the dead-letter stream.
+
+    Attributes:
+        client (redis.Redis): The redis client.
+        model (ModelInference): The loaded model.
+        stream (str): The work stream.
+        group (str): The consumer group shared by the workers.
+        consumer (str): The name of this worker in the group, unique per process.
+        read_count (int): The maximum number of entries read and scored together.
+        block_ms (int): How long a read waits for new entries.
+        claim_idle_ms (int): How long an entry stays pending before another worker claims it.
+        max_deliveries (int): The number of deliveries before an entry is dead-lettered.
+        result_ttl (int): The time to live of the stored predictions, in seconds.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        model,
+        stream: str = ScoringWorkerSettings().scoring_stream,
+        group: str = ScoringWorkerSettings().scoring_group,
+        consumer: str = None,
+        read_count: int = ScoringWorkerSettings().scoring_read_count,
+        block_ms: int = ScoringWorkerSettings().scoring_block_ms,
+        claim_idle_ms: int = ScoringWorkerSettings().scoring_claim_idle_ms,
+        max_deliveries: int = ScoringWorkerSettings().scoring_max_deliveries,
+        result_ttl: int = ScoringWorkerSettings().scoring_result_ttl,
+    ):
+        self.client = client
+        self.model = model
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.read_count = read_count
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.result_ttl = result_ttl
+        self._stopped = False
+        self.scored_batches = 0
+        self.scored_queries = 0
+        self.failed_batches = 0
+        self.reclaimed_batches = 0
+        self.dead_lettered = 0
+
+    def ensure_group(self):
+        """Create the stream and the consumer group, if they do not exist yet."""
+        try:
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            logger.info(f"Created consumer group {self.group} on {self.stream}")
+        except redis.ResponseError as ex:
+            if "BUSYGROUP" not in str(ex):
+                raise
+
+    def stop(self):
+        """Ask the worker to stop after the entries it is scoring."""
+        self._stopped = True
+
+    def pending(self) -> int:
+        """The number of entries delivered to the group and not acknowledged yet."""
+        return self.client.xpending(self.stream, self.group)["pending"]
+
+    def stats(self) -> dict:
+        """Returns the scoring, failure and redelivery counters of the worker."""
+        return {
+            "consumer": self.consumer,
+            "scored_batches": self.scored_batches,
+            "scored_queries": self.scored_queries,
+            "failed_batches": self.failed_batches,
+            "reclaimed_batches": self.reclaimed_batches,
+            "dead_lettered": self.dead_lettered,
+        }
+
+    def run_once(self) -> int:
+        """
+        Score the stale pending entries of the group if any, otherwise read new ones.
+
+        Returns:
+            int: The number of entries handled, 0 when the stream was idle.
+        """
+        entries = self._claim_stale()
+        if not entries:
+            response = self.client.xreadgroup(
+                self.group,
+                self.consumer,
+                {self.stream: ">"},
+                count=self.read_count,
+                block=self.block_ms,
+            )
+            entries = response[0][1] if response else []
+        if entries:
+            self._score(entries)
+        return len(entries)
+
+    def run(self, drain: bool = False):
+        """
+        Score entries until stopped.
+
+        Args:
+            drain (bool): Also stop once the stream is idle and no entry is pending.
+        """
+        self.ensure_group()
+        logger.info(f"Scoring worker {self.consumer} consuming {self.stream}")
+        while not self._stopped:
+            if self.run_once() == 0 and drain and self.pending() == 0:
+                break
+        logger.info(f"Scoring worker {self.consumer} stopped: {self.stats()}")
+
+    def _claim_stale(self) -> list:
+        """
+        Claim the entries left pending by failed or dead workers, and move the ones
+        delivered too many times to the dead-letter stream.
+        """
+        _, claimed, *_ = self.client.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=self.claim_idle_ms,
+            start_id="0-0",
+            count=self.read_count,
+        )
+        entries = []
+        for entry_id, fields in claimed:
+            if fields is None:
+                # trimmed from the stream while pending
+                self.client.xack(self.stream, self.group, entry_id)
+                continue
+            delivered = self.client.xpending_range(
+                self.stream, self.group, min=entry_id, max=entry_id, count=1
+            )[0]["times_delivered"]
+            if delivered > self.max_deliveries:
+                self._dead_letter(entry_id, fields, delivered)
+            else:
+                entries.append((entry_id, fields))
+
+        if entries:
+            self.reclaimed_batches += len(entries)
+            logger.info(f"Claimed {len(entries)} stale entries of {self.stream}")
+        return entries
+
+    def _dead_letter(self, entry_id, fields: dict, delivered: int):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.xadd(
+            dead_letter_stream(self.stream),
+            {**fields, "entry_id": entry_id, "deliveries": delivered},
+        )
+        pipe.xack(self.stream, self.group, entry_id)
+        pipe.execute()
+        self.dead_lettered += 1
+        logger.error(
+            f"Moved entry {entry_id!r} to {dead_letter_stream(self.stream)} "
+            f"after {delivered} deliveries"
+        )
+
+    def _score(self, entries: list):
+        """
+        Score the valid entries together, store their predictions and acknowledge them.
+        Invalid or failing entries are left pending, to be claimed again.
+        """
+        batches = []
+        for entry_id, fields in entries:
+            try:
+                batch_id = _field(fields, "batch_id")
+                queries = json.loads(_field(fields, "queries"))
+                if not batch_id or not isinstance(queries, list):
+                    raise ValueError("expected a batch_id and a JSON list of queries")
+            except (TypeError, ValueError) as ex:
+                self.failed_batches += 1
+                logger.warning(f"Leaving invalid entry {entry_id!r} pending: {ex}")
+                continue
+            batches.append((entry_id, batch_id, queries))
+
+        if not batches:
+            return
+
+        queries = [query for _, _, batch_queries in batches for query in batch_queries]
+        try:
+            results = self.model.predict(queries) if queries else []
+        except Exception:
+            self.failed_batches += len(batches)
+            logger.exception(
+                f"Scoring {len(batches)} entries failed, leaving them pending"
+            )
+            return
+
+        pipe = self.client.pipeline(transaction=True)
+        offset = 0
+        for _, batch_id, batch_queries in batches:
+            predictions = results[offset : offset + len(batch_queries)]
+            offset += len(batch_queries)
+            pipe.set(
+                result_key(self.stream, batch_id),
+                json.dumps(
+                    {
+                        "batch_id": batch_id,
+                        "model_version": self.model.model_version,
+                        "predictions": predictions,
+                    }
+                ),
+                ex=self.result_ttl,
+            )
+        pipe.xack(self.stream, self.group, *[entry_id for entry_id, _, _ in batches])
+        pipe.execute()
+
+        self.scored_batches += len(batches)
+        self.scored_queries += len(queries)
+
+
+if __name__ == "__main__":
+    setup_logging(
+        logger_name=LoggerSettings().logger_name,
+        log_file="ScoringWorker.log",
+        log_level=LoggerSettings().log_level,
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Scoring workers consuming a Redis Stream of question batches"
+    )
+    parser.add_argument("--stream", default=ScoringWorkerSettings().scoring_stream)
+    parser.add_argument(
+        "--fake",
+        action="store_true",
+        help="Use an in-memory fakeredis stand-in instead of the configured server",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    worker_parser = subparsers.add_parser("worker", help="Run a scoring worker")
+    worker_parser.add_argument("--group", default=ScoringWorkerSettings().scoring_group)
+    worker_parser.add_argument("--consumer", default=None)
+    worker_parser.add_argument(
+        "--drain",
+        action="store_true",
+        help="Stop once the stream is idle and no entry is pending",
+    )
+    worker_parser.add_argument(
+        "--seed-eval",
+        type=int,
+        default=0,
+        help="Enqueue this many evaluation questions first, for runs against --fake",
+    )
+
+    enqueue_parser = subparsers.add_parser(
+        "enqueue", help="Enqueue evaluation questions and print their batch ids"
+    )
+    enqueue_parser.add_argument("--num-questions", type=int, default=1000)
+
+    args = parser.parse_args()
+    client = get_redis_client(fake=args.fake)
+
+    def eval_questions(num_questions):
+        from src.benchmark import load_eval_questions
+
+        questions, _ = load_eval_questions()
+        return (questions * (num_questions // len(questions) + 1))[:num_questions]
+
+    if args.command == "enqueue":
+        batch_ids = enqueue_queries(
+            client, eval_questions(args.num_questions), args.stream
+        )
+        print(json.dumps(batch_ids, indent=2))
+
+    elif args.command == "worker":
+        from src.model_startup import model_startup
+
+        worker = ScoringWorker(
+            client,
+            model_startup(),
+            stream=args.stream,
+            group=args.group,
+            consumer=args.consumer,
+        )
+        worker.ensure_group()
+        batch_ids = []
+        if args.seed_eval:
+            batch_ids = enqueue_queries(
+                client, eval_questions(args.seed_eval), args.stream
+            )
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+
+        start = time.perf_counter()
+        worker.run(drain=args.drain)
+        seconds = time.perf_counter() - start
+
+        report = {
+            **worker.stats(),
+            "seconds": round(seconds, 2),
+            "queries_per_second": round(worker.scored_queries / seconds, 2),
+        }
+        if batch_ids:
+            results = get_results(client, batch_ids, args.stream)
+            report["seeded_batches_scored"] = sum(r is not None for r in results)
+        print(json.dumps(report, indent=2))
@@ -8,6 +8,7 @@ from torcheval.metrics import BinaryF1Score
 from tqdm import tqdm
 from transformers import AdamW, get_linear_schedule_with_warmup
 
+from src.pretrained_model import get_tokenizer
 from src.settings import LoggerSettings
 from src.utils.model_helpers import EarlyStopping
 
@@ -151,6 +152,7 @@ def training_drivers(
     epochs,
     device,
     model_name,
+    tokenizer=None,
 ):
     # loss
     criterion = torch.nn.BCEWithLogitsLoss()
@@ -165,7 +167,14 @@ def training_drivers(
     metric = BinaryF1Score(device=device)
 
     # early stopping
-    early_stopping = EarlyStopping(patience=5, verbose=True, model_name=model_name)
+    # the tokenizer also writes a self-contained model artifact with every checkpoint,
+    # the serving tokenizer is used unless another one is given
+    early_stopping = EarlyStopping(
+        patience=5,
+        verbose=True,
+        model_name=model_name,
+        tokenizer=tokenizer if tokenizer is not None else get_tokenizer(),
+    )
 
     return criterion, optimizer, scheduler, metric, early_stopping
 
@@ -1,6 +1,8 @@
 import logging
 import os
 import sys
+import time
+from contextlib import contextmanager
 from logging.handlers import RotatingFileHandler
 from typing import Optional
 
@@ -64,6 +66,22 @@ def setup_logging(
     return logger
 
 
+@contextmanager
+def log_duration(logger: logging.Logger, phase: str):
+    """
+    Log how long the wrapped block took.
+
+    Args:
+        logger (logging.Logger): The logger to write the duration to.
+        phase (str): The name of the timed phase.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        logger.info(f"Phase '{phase}' took {time.perf_counter() - start:.2f} s")
+
+
 if __name__ == "__main__":
 
     def main() -> None:
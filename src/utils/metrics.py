@@ -0,0 +1,61 @@
+import bisect
+import threading
+
+# upper bounds in milliseconds, the last bucket takes everything above
+DEFAULT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram, cheap enough to record every observation in production.
+
+    Observations cost a bisect and a few additions under a lock. Percentiles are estimated
+    as the upper bound of the bucket they fall into, capped at the maximum seen.
+    """
+
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._counts = [0] * (len(self.buckets_ms) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float):
+        """Record one observation in milliseconds."""
+        index = bisect.bisect_left(self.buckets_ms, value_ms)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value_ms
+            self._max = max(self._max, value_ms)
+
+    def percentile(self, q: float):
+        """Returns the bucket upper bound below which `q` percent of the observations fall."""
+        if self._count == 0:
+            return None
+        rank = q / 100 * self._count
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank and count:
+                if index < len(self.buckets_ms):
+                    return min(self.buckets_ms[index], round(self._max, 3))
+                return round(self._max, 3)
+        return self._max
+
+    def stats(self) -> dict:
+        """Returns the count, mean, max, percentile estimates and bucket counts."""
+        with self._lock:
+            counts = list(self._counts)
+            count, total, maximum = self._count, self._sum, self._max
+        bounds = [f"le_{bound}" for bound in self.buckets_ms] + ["inf"]
+        return {
+            "count": count,
+            "mean_ms": round(total / count, 3) if count else None,
+            "max_ms": round(maximum, 3) if count else None,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "buckets": dict(zip(bounds, counts)),
+        }
@@ -6,6 +6,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 import torch
 
+from src.model_artifact import artifact_path_for, save_model_artifact
+
 warnings.filterwarnings("ignore")
 
 
@@ -117,6 +119,7 @@ class EarlyStopping:
         trace_func=print,
         path="models",
         model_name="model.pt",
+        tokenizer=None,
     ):
         """
         Args:
@@ -132,6 +135,9 @@ class EarlyStopping:
                             Default: print
             path (str): Path for the checkpoint to be saved to.
                             Default: 'checkpoint.pt'
+            tokenizer (PreTrainedTokenizerFast): If given, a self-contained model artifact
+                            bundling config, tokenizer and weights is saved next to the checkpoint.
+                            Default: None
         """
         self.patience = patience
         self.verbose = verbose
@@ -143,6 +149,7 @@ class EarlyStopping:
         self.path = path
         self.model_name = model_name
         self.trace_func = trace_func
+        self.tokenizer = tokenizer
 
     def __call__(self, val_loss, model, epoch):
 
@@ -171,6 +178,12 @@ class EarlyStopping:
             )
         os.makedirs(self.path, exist_ok=True)
         torch.save(model.state_dict(), os.path.join(self.path, self.model_name))
+        if self.tokenizer is not None:
+            save_model_artifact(
+                model,
+                self.tokenizer,
+                artifact_path_for(os.path.join(self.path, self.model_name)),
+            )
         self.val_loss_min = val_loss
 
 
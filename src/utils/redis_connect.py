@@ -1,6 +1,7 @@
 from urllib.parse import quote
 from typing import Union
 import redis
+from redis import asyncio as aioredis
 import logging
 from src.settings import LoggerSettings
 from src.settings import env_settings
@@ -12,7 +13,7 @@ def _get_redis_url(
     redis_host: str = env_settings.REDIS_HOST,
     redis_port: int = env_settings.REDIS_PORT,
     redis_database: str = env_settings.REDIS_DB,
-    redis_password: Union[str, None] = None,
+    redis_password: Union[str, None] = env_settings.REDIS_PASSWORD,
 ) -> str:
     """Create a redis uri from given args
     redis://[username:user_pwd@]name_of_host [:port_number_of_redis_server] [/DB_Name]
@@ -28,6 +29,32 @@ def _get_redis_url(
     return redis_url
 
 
+def get_redis_client(fake: bool = False) -> redis.Redis:
+    """Create a redis client for the configured server,
+    or an in-memory fakeredis stand-in for local runs and tests
+    """
+    if fake:
+        import fakeredis
+
+        logger.info("Using in-memory fakeredis as redis stand-in")
+        return fakeredis.FakeRedis()
+
+    return redis.Redis.from_url(_get_redis_url())
+
+
+def get_async_redis_client(fake: bool = False) -> aioredis.Redis:
+    """Create an asyncio redis client for the configured server,
+    or an in-memory fakeredis stand-in for local runs and tests
+    """
+    if fake:
+        from fakeredis import aioredis as fake_aioredis
+
+        logger.info("Using in-memory fakeredis as redis stand-in")
+        return fake_aioredis.FakeRedis()
+
+    return aioredis.Redis.from_url(_get_redis_url())
+
+
 if __name__ == "__main__":
     # r = redis.Redis(host="localhost", port=6379, charset="utf-8", decode_responses=True)
     # print(r)
@@ -0,0 +1,42 @@
+"""
+Shared test setup.
+The modules read MODEL_TYPE, the database URI and the API credentials from dev.env for their
+defaults, which is not part of the repository, so test values are set before they are imported.
+"""
+
+import asyncio
+
+import pytest
+
+from src.settings import env_settings
+
+TEST_SETTINGS = {
+    "MODEL_TYPE": "base",
+    "DB_URI": "sqlite+aiosqlite:///:memory:",
+    "AUTH_USER": "test-user",
+    "AUTH_PASSWORD": "test-password",
+}
+
+for name, value in TEST_SETTINGS.items():
+    if getattr(env_settings, name, None) is None:
+        setattr(env_settings, name, value)
+
+
+@pytest.fixture
+def db_sessionmanager(tmp_path):
+    """
+    A session manager on a fresh SQLite database file with the tables created.
+    Tests dispose its engine on their own event loop.
+    """
+    from backend.db import Base, DatabaseSessionManager
+    import backend.db_models.models  # noqa: F401
+
+    manager = DatabaseSessionManager(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    async def create_tables():
+        async with manager._engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await manager._engine.dispose()
+
+    asyncio.run(create_tables())
+    return manager
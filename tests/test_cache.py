@@ -0,0 +1,269 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from src.cache import (
+    MemoryBoundedCache,
+    PredictionCache,
+    SingleFlight,
+    deep_getsizeof,
+)
+
+RECORD = {"prediction_label": "SIMPLE", "prediction_probability": 0.25}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(server=None, **kwargs):
+    redis = fakeredis.FakeAsyncRedis(server=server or fakeredis.FakeServer())
+    return PredictionCache(redis=redis, namespace="test-model:0.5", **kwargs)
+
+
+def test_set_then_get_from_l1_and_l2():
+    async def run():
+        server = fakeredis.FakeServer()
+        cache = make_cache(server)
+        key = cache.key("What is the sales of Corona?")
+        assert key == cache.key("  what is the SALES of corona  ")
+
+        assert await cache.get(key) is None
+        await cache.set(key, RECORD)
+        assert await cache.get(key) == RECORD
+        assert cache.l1.hits == 1 and cache.l2_hits == 0
+
+        # another replica with an empty L1 is served from the shared L2
+        replica = make_cache(server)
+        assert await replica.get(key) == RECORD
+        assert replica.l2_hits == 1
+        # and the L2 hit was copied into its L1
+        assert replica.l1.get(key) == RECORD
+
+    asyncio.run(run())
+
+
+def test_get_many_looks_up_l1_misses_in_l2():
+    async def run():
+        server = fakeredis.FakeServer()
+        cache = make_cache(server)
+        keys = [cache.key(query) for query in ("a question", "b question", "c")]
+        await cache.set_many({keys[0]: RECORD, keys[1]: {**RECORD, "n": 1}})
+
+        replica = make_cache(server)
+        await replica.set(keys[0], RECORD)
+        values = await replica.get_many(keys)
+        assert values == [RECORD, {**RECORD, "n": 1}, None]
+        assert (replica.l2_hits, replica.l2_misses) == (1, 1)
+
+        # uncounted lookups leave the statistics alone
+        await replica.get_many(keys, count=False)
+        assert (replica.l2_hits, replica.l2_misses) == (1, 1)
+        assert replica.l1.hits == 1
+
+    asyncio.run(run())
+
+
+def test_entries_expire_after_their_ttl():
+    async def run():
+        cache = make_cache(l1_ttl=60, l2_ttl=3600)
+        clock = FakeClock()
+        cache.l1.timer = clock
+        key = cache.key("a question")
+        await cache.set(key, RECORD)
+
+        ttl = await cache.redis.ttl(cache.key_prefix + key)
+        assert 0 < ttl <= 3600
+
+        clock.now = 61
+        assert cache.l1.get(key) is None
+        assert cache.l1.expirations == 1
+        # still served by L2 once the L1 entry expired
+        assert await cache.get(key) == RECORD
+
+        await cache.redis.delete(cache.key_prefix + key)
+        clock.now = 200
+        assert await cache.get(key) is None
+
+    asyncio.run(run())
+
+
+def test_redis_errors_fall_back_to_l1():
+    async def run():
+        server = fakeredis.FakeServer()
+        cache = make_cache(server)
+        server.connected = False
+        key = cache.key("a question")
+
+        assert await cache.get(key) is None
+        await cache.set(key, RECORD)
+        await cache.set_many({cache.key("another question"): RECORD})
+        assert await cache.get_many([key, cache.key("a third one")]) == [RECORD, None]
+        assert await cache.get(key) == RECORD
+        assert cache.l2_errors == 4
+
+    asyncio.run(run())
+
+
+def test_l1_only_without_redis():
+    async def run():
+        cache = PredictionCache(redis=None, namespace="test-model:0.5")
+        key = cache.key("a question")
+        await cache.set(key, RECORD)
+        assert await cache.get(key) == RECORD
+        assert cache.stats()["l2"] is None
+
+    asyncio.run(run())
+
+
+def entry_size(key, value):
+    return deep_getsizeof(key) + deep_getsizeof(value)
+
+
+def test_l1_stays_within_its_byte_budget_and_evicts_least_recently_used():
+    value = "x" * 100
+    size = entry_size("key0", value)
+    cache = MemoryBoundedCache(max_bytes=3 * size, ttl=60)
+    for key in ("key0", "key1", "key2"):
+        cache.get(key)
+        assert cache.set(key, value)
+    assert cache.resident_bytes == 3 * size
+
+    # key0 becomes the most recently used, so key1 is evicted first
+    cache.get("key0")
+    cache.get("key3")
+    assert cache.set("key3", value)
+    assert cache.get("key1") is None
+    assert [cache.get(key) for key in ("key0", "key2", "key3")] == [value] * 3
+    assert cache.evictions == 1
+    assert cache.resident_bytes <= cache.max_bytes
+
+
+def test_l1_rejects_cold_keys_that_would_evict_hot_ones():
+    value = "x" * 100
+    size = entry_size("hot0", value)
+    clock = FakeClock()
+    cache = MemoryBoundedCache(max_bytes=2 * size, ttl=60, timer=clock)
+    for key in ("hot0", "hot1"):
+        for _ in range(3):
+            cache.get(key)
+        assert cache.set(key, value)
+
+    # a one-off key is not admitted at the expense of the popular ones
+    cache.get("cold")
+    assert not cache.set("cold", value)
+    assert cache.rejections == 1
+    assert cache.get("hot0") == value and cache.get("hot1") == value
+
+    # expired entries are evicted whatever their popularity
+    clock.now = 61
+    assert cache.set("cold", value)
+    assert cache.expirations == 1
+
+
+def test_l1_rejected_sets_leave_the_cache_untouched():
+    value = "x" * 100
+    size = entry_size("key0", value)
+    cache = MemoryBoundedCache(max_bytes=2 * size, ttl=60)
+    for key in ("key0", "key1"):
+        cache.get(key)
+        cache.get(key)
+        assert cache.set(key, value)
+
+    # larger than the whole budget
+    assert not cache.set("huge", "x" * (3 * size))
+    # re-setting a key with a value that no longer fits next to a hot entry
+    assert not cache.set("key0", "x" * (size + size // 2))
+    assert cache.get("key0") == value and cache.get("key1") == value
+    assert cache.resident_bytes == 2 * size
+
+    # re-setting a key with a value of the same size replaces it in place
+    assert cache.set("key0", "y" * 100)
+    assert cache.get("key0") == "y" * 100
+    assert cache.resident_bytes == 2 * size
+    assert cache.evictions == 0
+
+
+def test_single_flight_runs_concurrent_identical_calls_once():
+    async def run():
+        single_flight = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def predict():
+            calls.append(1)
+            await release.wait()
+            return RECORD
+
+        callers = [
+            asyncio.create_task(single_flight.do("key", predict)) for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers)
+
+        assert len(calls) == 1
+        assert [result for result, _ in results] == [RECORD] * 5
+        assert sorted(shared for _, shared in results) == [False] + [True] * 4
+        assert single_flight.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+    asyncio.run(run())
+
+
+def test_single_flight_raises_the_error_to_every_caller_and_releases_the_key():
+    async def run():
+        single_flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def failing():
+            await release.wait()
+            raise RuntimeError("forward pass failed")
+
+        callers = [
+            asyncio.create_task(single_flight.do("key", failing)) for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert single_flight.stats()["in_flight"] == 0
+
+        # the next call runs again instead of getting the old error
+        async def succeeding():
+            return RECORD
+
+        assert await single_flight.do("key", succeeding) == (RECORD, False)
+
+    asyncio.run(run())
+
+
+def test_single_flight_waiter_takes_over_a_cancelled_call():
+    async def run():
+        single_flight = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def predict():
+            calls.append(1)
+            await release.wait()
+            return RECORD
+
+        leader = asyncio.create_task(single_flight.do("key", predict))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(single_flight.do("key", predict))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+
+        assert await waiter == (RECORD, False)
+        assert len(calls) == 2
+
+    asyncio.run(run())
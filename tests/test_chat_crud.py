@@ -0,0 +1,46 @@
+import asyncio
+import uuid
+
+from sqlalchemy import func, select
+
+from backend.crud.chat import upsert_chat
+from backend.db_models.models import ChatRecord
+
+
+def test_upsert_inserts_then_updates_in_place(db_sessionmanager):
+    async def run():
+        chat = {
+            "session_id": uuid.uuid4(),
+            "chat_id": uuid.uuid4(),
+            "user_query": "what is the sales of corona?",
+            "status": "pending",
+        }
+        async with db_sessionmanager.session() as session:
+            inserted = await upsert_chat(session, chat)
+        assert inserted["chat_id"] == chat["chat_id"]
+        assert inserted["status"] == "pending"
+        assert inserted["prediction_label"] is None
+
+        completed = {
+            **chat,
+            "status": "completed",
+            "prediction_label": "SIMPLE",
+            "prediction_probability": 0.25,
+        }
+        async with db_sessionmanager.session() as session:
+            updated = await upsert_chat(session, completed)
+        # the same row, read back through RETURNING
+        assert updated["id"] == inserted["id"]
+        assert updated["status"] == "completed"
+        assert updated["prediction_label"] == "SIMPLE"
+        assert updated["prediction_probability"] == 0.25
+
+        async with db_sessionmanager.session() as session:
+            assert await session.scalar(select(func.count(ChatRecord.id))) == 1
+            record = await session.scalar(
+                select(ChatRecord).filter(ChatRecord.chat_id == chat["chat_id"])
+            )
+            assert record.status == "completed"
+        await db_sessionmanager.close()
+
+    asyncio.run(run())
@@ -0,0 +1,37 @@
+import os
+
+import torch
+from safetensors.torch import save_file
+
+from src.inference import ModelInference, file_fingerprint
+
+
+def test_fingerprint_follows_safetensors_header(tmp_path):
+    path = str(tmp_path / "classifier.safetensors")
+    save_file({"weight": torch.zeros(4)}, path, metadata={"model_type": "base"})
+    fingerprint = file_fingerprint(path)
+    assert file_fingerprint(path) == fingerprint
+
+    # same size and modification time, only the header metadata differs
+    stat = os.stat(path)
+    save_file({"weight": torch.zeros(4)}, path, metadata={"model_type": "xase"})
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert os.path.getsize(path) == stat.st_size
+    assert file_fingerprint(path) != fingerprint
+
+
+def test_fingerprint_follows_modification_time(tmp_path):
+    path = tmp_path / "classifier.pt"
+    path.write_bytes(b"weights")
+    fingerprint = file_fingerprint(str(path))
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert file_fingerprint(str(path)) != fingerprint
+
+
+def test_model_version_without_weights_file():
+    model = ModelInference.__new__(ModelInference)
+    model.model_type, model.backend, model.precision = "base", "torch", "fp32"
+    model.weights_path = None
+    assert model.model_version == "base-torch-fp32-unversioned"
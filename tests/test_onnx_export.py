@@ -0,0 +1,46 @@
+import numpy as np
+import onnxruntime as ort
+import torch
+from transformers import BertConfig, BertModel
+
+from src.model import BertSentimentClassifier
+from src.onnx_export import export_classifier
+
+
+def test_onnx_logits_match_torch(tmp_path):
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=100,
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+    )
+    classifier = BertSentimentClassifier(bert=BertModel(config), n_classes=1).eval()
+
+    # trace on one shape, compare on another padded batch to exercise the dynamic axes
+    sample_ids = torch.randint(1, config.vocab_size, (1, 8))
+    onnx_path = export_classifier(
+        classifier,
+        sample_ids,
+        torch.ones_like(sample_ids),
+        str(tmp_path / "classifier.onnx"),
+    )
+
+    input_ids = torch.randint(1, config.vocab_size, (3, 12))
+    attention_mask = torch.ones_like(input_ids)
+    attention_mask[1, 7:] = 0
+    attention_mask[2, 4:] = 0
+    input_ids[attention_mask == 0] = 0
+
+    with torch.inference_mode():
+        torch_logits = classifier(input_ids, attention_mask).numpy()
+
+    session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    (onnx_logits,) = session.run(
+        ["logits"],
+        {"input_ids": input_ids.numpy(), "attention_mask": attention_mask.numpy()},
+    )
+
+    assert onnx_logits.shape == torch_logits.shape
+    np.testing.assert_allclose(onnx_logits, torch_logits, rtol=0, atol=1e-4)
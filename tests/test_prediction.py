@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from backend.dependencies.auth import verification
+from backend.routes import prediction
+from src.cache import PredictionCache, SingleFlight
+from src.executor import InferenceQueueFull
+
+
+class FakeBatcher:
+    """Counts the forward passes, which wait until released."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def predict(self, user_query):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return {"prediction_label": "SIMPLE", "prediction_probability": 0.25}
+
+
+class FakeChatWriter:
+    def __init__(self):
+        self.records = []
+
+    async def submit(self, chat_dict):
+        self.records.append(chat_dict)
+
+
+def make_app(batcher):
+    app = FastAPI()
+    app.include_router(prediction.router)
+    app.dependency_overrides[verification] = lambda: True
+    app.state.batcher = batcher
+    app.state.cache = PredictionCache(redis=None, namespace="test-model:0.5")
+    app.state.semantic_cache = None
+    app.state.single_flight = SingleFlight()
+    app.state.chat_writer = FakeChatWriter()
+    return app
+
+
+async def post_concurrently(app, batcher, queries):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        requests = [
+            asyncio.create_task(
+                client.post(
+                    "/api/predict", json={"user_query": query, "session_id": None}
+                )
+            )
+            for query in queries
+        ]
+        # let every request reach the prediction before it finishes
+        for _ in range(100):
+            if batcher.calls:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        batcher.release.set()
+        return await asyncio.gather(*requests)
+
+
+def test_concurrent_identical_queries_share_one_forward_pass():
+    async def run():
+        batcher = FakeBatcher()
+        app = make_app(batcher)
+        queries = ["What is the sales of Corona?"] * 4 + ["what is the SALES of corona"]
+        responses = await post_concurrently(app, batcher, queries)
+
+        assert batcher.calls == 1
+        assert [response.status_code for response in responses] == [200] * 5
+        answers = [response.json() for response in responses]
+        assert [answer["user_query"] for answer in answers] == queries
+        assert {answer["prediction_label"] for answer in answers} == {"SIMPLE"}
+        # every caller gets and saves a chat record of its own
+        assert len({answer["chat_id"] for answer in answers}) == 5
+        assert len(app.state.chat_writer.records) == 5
+
+    asyncio.run(run())
+
+
+def test_prediction_error_reaches_every_duplicate_and_releases_the_key():
+    async def run():
+        batcher = FakeBatcher(error=InferenceQueueFull("Inference queue is full"))
+        app = make_app(batcher)
+        responses = await post_concurrently(app, batcher, ["a question"] * 3)
+
+        assert batcher.calls == 1
+        assert [response.status_code for response in responses] == [503] * 3
+        assert app.state.single_flight.stats()["in_flight"] == 0
+        assert app.state.chat_writer.records == []
+
+        # the next request predicts again
+        batcher.error = None
+        responses = await post_concurrently(app, batcher, ["a question"])
+        assert batcher.calls == 2
+        assert responses[0].status_code == 200
+
+    asyncio.run(run())
@@ -0,0 +1,56 @@
+import asyncio
+
+from backend.routes.stream_prediction import _read_lines
+
+
+class FakeRequest:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def read_lines(chunks, max_line_bytes=16):
+    async def run():
+        return [line async for line in _read_lines(FakeRequest(chunks), max_line_bytes)]
+
+    return asyncio.run(run())
+
+
+def test_lines_split_across_chunks():
+    chunks = [b'"first', b' question"\n"sec', b'ond"', b"\n", b'"third"\n']
+    assert read_lines(chunks) == [
+        (1, b'"first question"'),
+        (2, b'"second"'),
+        (3, b'"third"'),
+    ]
+
+
+def test_trailing_line_without_newline():
+    assert read_lines([b'"one"\n"tw', b'o"']) == [(1, b'"one"'), (2, b'"two"')]
+    # trailing blank space is not a line
+    assert read_lines([b'"one"\n', b"  "]) == [(1, b'"one"')]
+
+
+def test_oversized_line_arriving_whole():
+    chunks = [b'"short"\n"' + b"x" * 20 + b'"\n"after"\n']
+    assert read_lines(chunks) == [(1, b'"short"'), (2, None), (3, b'"after"')]
+
+
+def test_oversized_line_split_across_chunks():
+    chunks = [b'"short"\n"' + b"x" * 10, b"x" * 10, b"x" * 10 + b'"\n"after"\n']
+    assert read_lines(chunks) == [(1, b'"short"'), (2, None), (3, b'"after"')]
+
+
+def test_oversized_trailing_line():
+    # whole in the last chunk, and split over several chunks
+    assert read_lines([b'"short"\n"' + b"x" * 20 + b'"']) == [
+        (1, b'"short"'),
+        (2, None),
+    ]
+    assert read_lines([b'"short"\n"' + b"x" * 10, b"x" * 10 + b'"']) == [
+        (1, b'"short"'),
+        (2, None),
+    ]
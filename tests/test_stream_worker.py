@@ -0,0 +1,54 @@
+import fakeredis
+
+from src.stream_worker import (
+    ScoringWorker,
+    dead_letter_stream,
+    enqueue_queries,
+    get_results,
+)
+
+STREAM = "test:scoring"
+
+
+class FakeModel:
+    model_version = "fake-model"
+
+    def predict(self, queries):
+        return [{"query": query, "label": "question"} for query in queries]
+
+
+def test_poison_entry_is_dead_lettered_after_max_deliveries():
+    client = fakeredis.FakeRedis()
+    worker = ScoringWorker(
+        client,
+        FakeModel(),
+        stream=STREAM,
+        group="test-group",
+        consumer="test-worker",
+        block_ms=10,
+        claim_idle_ms=0,
+        max_deliveries=2,
+    )
+    worker.ensure_group()
+
+    batch_ids = enqueue_queries(
+        client, [f"question {i}" for i in range(5)], STREAM, max_batch_queries=2
+    )
+    client.xadd(STREAM, {"batch_id": "poison", "queries": "not json"})
+
+    for _ in range(10):
+        worker.run_once()
+
+    results = get_results(client, batch_ids, STREAM)
+    assert [len(result["predictions"]) for result in results] == [2, 2, 1]
+    assert all(result["model_version"] == "fake-model" for result in results)
+
+    dead_letters = client.xrange(dead_letter_stream(STREAM))
+    assert len(dead_letters) == 1
+    _, fields = dead_letters[0]
+    assert fields[b"batch_id"] == b"poison"
+    assert int(fields[b"deliveries"]) == worker.max_deliveries + 1
+
+    assert worker.pending() == 0
+    assert worker.dead_lettered == 1
+    assert worker.failed_batches == worker.max_deliveries
@@ -0,0 +1,104 @@
+import asyncio
+import contextlib
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.db_models.models import ChatRecord
+from backend.write_behind import ChatRecordWriter
+
+
+def chat_record(i):
+    return {
+        "session_id": uuid.uuid4(),
+        "chat_id": uuid.uuid4(),
+        "user_query": f"question {i}",
+        "status": "completed",
+        "prediction_label": "SIMPLE",
+        "prediction_probability": 0.25,
+    }
+
+
+async def count_records(sessionmanager):
+    async with sessionmanager.session() as session:
+        return await session.scalar(select(func.count(ChatRecord.id)))
+
+
+class FlakySessionManager:
+    """Fails the first `failures` sessions, then hands out the sessions of `sessionmanager`."""
+
+    def __init__(self, sessionmanager, failures):
+        self.sessionmanager = sessionmanager
+        self.failures = failures
+
+    @contextlib.asynccontextmanager
+    async def session(self):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        async with self.sessionmanager.session() as session:
+            yield session
+
+
+def test_stop_flushes_the_queued_records(db_sessionmanager):
+    async def run():
+        # neither the batch size nor the interval triggers a flush before the stop
+        writer = ChatRecordWriter(
+            db_sessionmanager, max_batch=1000, flush_interval_ms=60000
+        )
+        await writer.start()
+        await writer.submit_many([chat_record(i) for i in range(5)])
+        await writer.submit(chat_record(5))
+        await asyncio.sleep(0.05)
+        assert await count_records(db_sessionmanager) == 0
+
+        await writer.stop()
+        assert await count_records(db_sessionmanager) == 6
+        assert writer.flushed_records == 6 and writer.queue_depth == 0
+        await db_sessionmanager.close()
+
+    asyncio.run(run())
+
+
+def test_failed_flush_is_retried(db_sessionmanager):
+    async def run():
+        writer = ChatRecordWriter(
+            FlakySessionManager(db_sessionmanager, failures=2),
+            mode="group_commit",
+            max_batch=10,
+            flush_interval_ms=10,
+            max_retries=3,
+        )
+        await writer.start()
+        await writer.submit_many([chat_record(i) for i in range(3)])
+        await writer.stop()
+
+        assert await count_records(db_sessionmanager) == 3
+        assert writer.flushed_records == 3 and writer.failed_records == 0
+        await db_sessionmanager.close()
+
+    asyncio.run(run())
+
+
+def test_flush_failing_every_attempt_is_reported(db_sessionmanager):
+    async def run():
+        writer = ChatRecordWriter(
+            FlakySessionManager(db_sessionmanager, failures=3),
+            mode="group_commit",
+            max_batch=10,
+            flush_interval_ms=10,
+            max_retries=3,
+        )
+        await writer.start()
+        # the waiting callers get the error of the dropped batch
+        with pytest.raises(ConnectionError):
+            await writer.submit_many([chat_record(i) for i in range(3)])
+        await writer.stop()
+
+        assert writer.failed_records == 3
+        assert writer.stats()["failed_records"] == 3
+        assert await count_records(db_sessionmanager) == 0
+        await db_sessionmanager.close()
+
+    asyncio.run(run())